@@ -0,0 +1,52 @@
+# aggregation.py
+# Label -> category-group mapping and the vectorized month x label /
+# month x group matrices every dashboard section reads from. Each matrix is
+# built in a single pivot/groupby pass, whether the input is the rollup rows
+# from db.get_label_totals() or raw expense rows.
+#
+# The mappings are needed by db.py's schema code, so pandas is only imported
+# once a matrix is built.
+
+# Category groups shown on the dashboard, in display order
+CATEGORY_GROUPS = {
+    "Basic (Essentials)": ["Dining", "House", "Fuel"],
+    "Dog Expenses": ["Chicken", "Lovely"],
+    "EMI": ["EMI"],
+    "Non-Essentials": ["Non-Essentials"],
+}
+
+LABEL_TO_GROUP = {label: group for group, labels in CATEGORY_GROUPS.items() for label in labels}
+
+# Groups counted as essential spending on the Essentials vs Non-Essentials chart
+ESSENTIAL_GROUPS = ["Basic (Essentials)", "Dog Expenses", "EMI"]
+
+
+def _label_order(labels):
+    known = list(LABEL_TO_GROUP)
+    return sorted(labels, key=lambda l: (known.index(l) if l in known else len(known), l))
+
+
+def label_matrix(frame, value="total", index="period"):
+    # period x label totals; rows in period order, grouped labels first
+    import pandas as pd
+
+    if frame.empty:
+        return pd.DataFrame(dtype=float)
+    matrix = frame.pivot_table(index=index, columns="label", values=value, aggfunc="sum", fill_value=0)
+    matrix = matrix.sort_index()
+    return matrix[_label_order(matrix.columns)].rename_axis(columns=None)
+
+
+def group_matrix(labels):
+    # Collapse a label matrix to period x group; labels outside every group drop out
+    groups = labels.T.groupby(labels.columns.map(LABEL_TO_GROUP)).sum().T
+    return groups.reindex(index=labels.index, columns=list(CATEGORY_GROUPS), fill_value=0)
+
+
+def month_row(matrix, period):
+    # One period's totals, zero-filled when the period has no entries
+    import pandas as pd
+
+    if period in matrix.index:
+        return matrix.loc[period]
+    return pd.Series(0, index=matrix.columns, dtype=matrix.dtypes.iloc[0] if len(matrix.columns) else float)
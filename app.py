@@ -1,452 +1,558 @@
-# app.py
-import streamlit as st
-import pandas as pd
-from datetime import datetime
-import calendar
-from db import init_db, insert_expense, delete_last_expense, get_all_expenses
-import altair as alt
-
-# Initialize database
-init_db()
-
-# Background color using custom CSS
-st.markdown(
-    """
-    <style>
-    .stApp {
-        background-color: #1C3948;
-    }
-    [data-testid="stSidebar"] {
-        background-color: #CC8A4D; 
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-# ---- SIDEBAR INPUT FORM ----
-st.sidebar.title("Add Expense")
-
-
-# Dropdowns for month and year
-month = st.sidebar.selectbox("Select Month", list(calendar.month_name)[6:])
-year = st.sidebar.selectbox("Select Year", list(range(2025, datetime.now().year + 1)))
-date_str = f"{month} {year}"
-
-with st.sidebar.form("expense_form", clear_on_submit=False):
-    label = st.selectbox("Select Expense Category:", [
-        "Dining", "Chicken", "Lovely", "House", "Fuel", "EMI", "Non-Essentials"
-    ])
-    col_amt, col_btn = st.columns([2, 1])
-    with col_amt:
-        amount = st.number_input("Enter Amount", min_value=0, step=10, format="%d")
-    with col_btn:
-        st.markdown("<div style='height: 1.8em'></div>", unsafe_allow_html=True)
-        submitted = st.form_submit_button("Add")
-    comment = st.text_input("Comment (optional)" if label != "Non-Essentials" else "Comment (required)")
-
-if submitted:
-    if label == "Non-Essentials" and comment.strip() == "":
-        st.warning("Comment is required for Non-Essentials.")
-    else:
-        insert_expense(date_str, label, amount, comment.strip())
-        st.rerun()
-
-    if label == "Non-Essentials" and comment.strip() == "":
-        st.sidebar.warning("Comment is required for Non-Essentials.")
-    else:
-        insert_expense(date_str, label, amount, comment.strip())
-        st.rerun()
-
-# Delete last entry
-if st.sidebar.button("Delete Last Entry"):
-    delete_last_expense()
-    st.rerun()
-
-# ---- MAIN SECTION ----
-
-# st.title("📊 Monthly Expense Tracker")
-
-# Calculate and display summary totals: total value for selected month
-df = get_all_expenses()
-df_filtered = df[df["date_str"] == date_str]
-if not df_filtered.empty:
-    basic_total = df_filtered[df_filtered['label'].isin(["Dining", "House", "Fuel"])] ["amount"].sum()
-    dog_total = df_filtered[df_filtered['label'].isin(["Chicken", "Lovely"])] ["amount"].sum()
-    emi_total = df_filtered[df_filtered['label'] == "EMI"] ["amount"].sum()
-    non_essential_total = df_filtered[df_filtered['label'] == "Non-Essentials"] ["amount"].sum()
-    summary_total = int(basic_total) + int(dog_total) + int(emi_total) + int(non_essential_total)
-
-    # Calculate last month
-    month_names = list(calendar.month_name)
-    current_month_idx = month_names.index(month)
-    if current_month_idx == 1:
-        prev_month = month_names[12]
-        prev_year = year - 1
-    else:
-        prev_month = month_names[current_month_idx - 1]
-        prev_year = year
-    prev_date_str = f"{prev_month} {prev_year}"
-    prev_df = df[df["date_str"] == prev_date_str]
-    if not prev_df.empty:
-        prev_basic = prev_df[prev_df['label'].isin(["Dining", "House", "Fuel"])] ["amount"].sum()
-        prev_dog = prev_df[prev_df['label'].isin(["Chicken", "Lovely"])] ["amount"].sum()
-        prev_emi = prev_df[prev_df['label'] == "EMI"] ["amount"].sum()
-        prev_non_essential = prev_df[prev_df['label'] == "Non-Essentials"] ["amount"].sum()
-        prev_total = int(prev_basic) + int(prev_dog) + int(prev_emi) + int(prev_non_essential)
-    else:
-        prev_total = 0
-
-
-    # Determine color and rupee symbol for this month expense
-    if summary_total < prev_total:
-        this_color = '#4CAF50'  # green
-    elif summary_total > prev_total:
-        this_color = '#FF5252'  # red
-    else:
-        this_color = '#fff'     # white
-    rupee = '&#8377;'
-    st.markdown(f"""
-        <div style='text-align:center; font-size:2em; font-weight:bold; letter-spacing:2px; color:#E68C3A; text-transform:uppercase;'>
-            {month.upper()} {year} EXPENSE: <span style='color:{this_color};'>{rupee} {summary_total:,}</span>
-        </div>
-        <div style='text-align:center; font-size:1.1em; color:#E68C3A; margin-top:0.2em;'>
-            Last month expense: <span style='color:#fff;'>{rupee} {prev_total:,}</span>
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Add vertical space and a divider for presentation
-    st.markdown("<br>", unsafe_allow_html=True)
-    st.divider()
-
-df = get_all_expenses()
-
-if df.empty:
-    st.info("No data available yet.")
-else:
-    # Filter by selected month/year
-    df_filtered = df[df["date_str"] == date_str]
-
-    if df_filtered.empty:
-        st.warning(f"No records for {date_str}")
-    else:
-        # Group totals
-        def get_total(labels):
-            return df_filtered[df_filtered['label'].isin(labels)]['amount'].sum()
-
-        basic_total = get_total(["Dining", "House", "Fuel"])
-        dog_total = get_total(["Chicken", "Lovely"])
-        emi_total = get_total(["EMI"])
-        non_essential_total = get_total(["Non-Essentials"])
-
-
-
-        st.markdown("<h3 style='text-align:left; color:#fff; font-weight:bold;'>Summary Totals</h3>", unsafe_allow_html=True)
-        col1, col2 = st.columns([2,2])
-
-        with col1:
-            summary_df = pd.DataFrame({
-                "Category": ["Basic (Essentials)", "Dog Expenses", "EMI", "Non-Essentials"],
-                "Total": [int(basic_total), int(dog_total), int(emi_total), int(non_essential_total)]
-            })
-            total_sum = summary_df["Total"].sum()
-            summary_df = pd.concat([
-                summary_df,
-                pd.DataFrame({"Category": ["Total"], "Total": [total_sum]})
-            ], ignore_index=True)
-            summary_df.index += 1
-            st.table(summary_df)
-            summary_csv = summary_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label=" Download",
-                data=summary_csv,
-                file_name=f'summary_totals_{date_str.replace(" ", "_")}.csv',
-                mime='text/csv'
-            )
-
-        with col2:
-            import altair as alt
-            pie_df = summary_df[summary_df["Category"] != "Total"]
-            pie_chart = alt.Chart(pie_df).mark_arc(innerRadius=90, stroke='white', strokeWidth=3).encode(
-                theta=alt.Theta(field="Total", type="quantitative"),
-                color=alt.Color(field="Category", type="nominal"),
-                tooltip=["Category", "Total"]
-            ).properties(
-                width=300,
-                height=300,
-                background="#1C3948"
-            )
-            st.altair_chart(pie_chart, use_container_width=True)
-
-
-        # Expense Category Totals table and pie chart side by side
-
-        st.markdown("<h3 style='text-align:left; color:#fff; font-weight:bold;'>Expense Category Totals</h3>", unsafe_allow_html=True)
-        cat_col1, cat_col2 = st.columns([2,2])
-
-        with cat_col1:
-            label_totals = df_filtered.groupby("label")["amount"].sum().astype(int).reset_index()
-            label_totals.columns = ["Label", "Total"]
-            label_totals.index += 1
-            st.table(label_totals)
-
-        with cat_col2:
-            import altair as alt
-            if not label_totals.empty:
-                pie_chart2 = alt.Chart(label_totals).mark_arc(innerRadius=90, stroke='white', strokeWidth=3).encode(
-                    theta=alt.Theta(field="Total", type="quantitative"),
-                    color=alt.Color(field="Label", type="nominal"),
-                    tooltip=["Label", "Total"]
-                ).properties(
-                    width=300,
-                    height=300,
-                    background="#1C3948"
-                )
-                st.altair_chart(pie_chart2, use_container_width=True)
-
-
-        # Essentials vs Non-Essentials Table and Pie Chart side by side
-        st.divider()
-        essentials_total = int(basic_total) + int(dog_total) + int(emi_total)
-        non_essentials_total = int(non_essential_total)
-        essentials_vs_non_df = pd.DataFrame({
-            "Category": ["Essentials Total", "Non-Essentials Total"],
-            "Total": [essentials_total, non_essentials_total]
-        })
-        # Merged right-aligned section title above both columns
-        st.markdown("<h3 style='text-align:right; color:#fff; font-weight:bold;'>Essentials vs Non-Essentials</h3>", unsafe_allow_html=True)
-        ess_col1, ess_col2 = st.columns([2,2])
-        with ess_col1:
-            import altair as alt
-            pie_chart3 = alt.Chart(essentials_vs_non_df).mark_arc(innerRadius=90, stroke='white', strokeWidth=3).encode(
-                theta=alt.Theta(field="Total", type="quantitative"),
-                color=alt.Color(field="Category", type="nominal"),
-                tooltip=["Category", "Total"]
-            ).properties(
-                width=300,
-                height=300,
-                background="#1C3948"
-            )
-            st.altair_chart(pie_chart3, use_container_width=True)
-        with ess_col2:
-            essentials_vs_non_df.index += 1
-            st.table(essentials_vs_non_df)
-        st.divider()
-
-
-
-
-        # All entries table as dropdown with label filter
-        with st.expander(f"All Entries for {date_str}"):
-            label_options = ["All"] + sorted(df_filtered["label"].unique().tolist())
-            selected_label = st.selectbox("Filter by Label", label_options, key="all_entries_label_filter")
-            df_filtered["amount"] = df_filtered["amount"].astype(int)
-            if selected_label == "All":
-                display_df = df_filtered
-            else:
-                display_df = df_filtered[df_filtered["label"] == selected_label]
-            total_amt = display_df["amount"].sum()
-            st.markdown(f"**Total Amount: <span style='color:#E68C3A;font-size:1.2em'>{total_amt:,}</span>**", unsafe_allow_html=True)
-            df_to_show = display_df[["date_str", "label", "amount", "comment", "timestamp"]].copy()
-            df_to_show.index += 1
-            st.table(df_to_show)
-            # Add download button for filtered table
-            table_csv = df_to_show.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="D",
-                data=table_csv,
-                file_name=f'all_entries_{date_str.replace(" ", "_")}_{selected_label}.csv',
-                mime='text/csv'
-            )
-
-        # --- Multi-Line Chart for Summary Totals for All Months ---
-        st.divider()
-        st.markdown("<h3 style='text-align:center; color:#fff; font-weight:bold;'>📈 Month to Month Analysis</h3>", unsafe_allow_html=True)
-        # Prepare summary totals for all months
-        all_months = df["date_str"].unique()
-        summary_list = []
-        for m in sorted(all_months, key=lambda x: (int(x.split()[1]), list(calendar.month_name).index(x.split()[0]))):
-            month_df = df[df["date_str"] == m]
-            basic = month_df[month_df['label'].isin(["Dining", "House", "Fuel"])] ["amount"].sum()
-            dog = month_df[month_df['label'].isin(["Chicken", "Lovely"])] ["amount"].sum()
-            emi = month_df[month_df['label'] == "EMI"] ["amount"].sum()
-            non_ess = month_df[month_df['label'] == "Non-Essentials"] ["amount"].sum()
-            summary_list.append({
-                "Month": m,
-                "Basic (Essentials)": int(basic),
-                "Dog Expenses": int(dog),
-                "EMI": int(emi),
-                "Non-Essentials": int(non_ess)
-            })
-        summary_line_df = pd.DataFrame(summary_list)
-        if not summary_line_df.empty:
-            line_df = summary_line_df.melt(id_vars=["Month"], value_vars=["Basic (Essentials)", "Dog Expenses", "EMI", "Non-Essentials"], var_name="Category", value_name="Total")
-            # Main multi-line chart
-            line_chart_main = alt.Chart(line_df).mark_line(point=True, strokeWidth=3).encode(
-                x=alt.X('Month:N', sort=None, axis=alt.Axis(
-                    labelAngle=-45,
-                    domainColor='white',
-                    tickColor='white',
-                    labelColor='white',
-                    titleColor='white',
-                    gridColor='white',
-                    gridOpacity=0.3
-                )),
-                y=alt.Y('Total:Q', axis=alt.Axis(
-                    domainColor='white',
-                    tickColor='white',
-                    labelColor='white',
-                    titleColor='white',
-                    gridColor='white',
-                    gridOpacity=0.3
-                )),
-                color=alt.Color('Category:N'),
-                tooltip=['Month', 'Category', 'Total']
-            )
-            # Vertical rules at each month
-            months_unique = line_df['Month'].unique().tolist()
-            rule_df = pd.DataFrame({'Month': months_unique})
-            vlines = alt.Chart(rule_df).mark_rule(
-                color='white',
-                strokeDash=[4,2],
-                size=2,
-                opacity=0.4
-            ).encode(
-                x=alt.X('Month:N', sort=None)
-            )
-            line_chart = (line_chart_main + vlines).properties(
-                width='container',
-                height=400,
-                background="#1C3948"
-            )
-            st.altair_chart(line_chart, use_container_width=True)
-
-        # --- Multi-Line Chart for Expense Category Totals Table ---
-        st.divider()
-        st.markdown("<h3 style='text-align:center; color:#fff; font-weight:bold;'>📈 Category Totals by Month</h3>", unsafe_allow_html=True)
-        # Prepare category totals for all months
-        cat_months = df["date_str"].unique()
-        cat_labels = df["label"].unique()
-        cat_list = []
-        for m in sorted(cat_months, key=lambda x: (int(x.split()[1]), list(calendar.month_name).index(x.split()[0]))):
-            month_df = df[df["date_str"] == m]
-            for label in cat_labels:
-                total = month_df[month_df["label"] == label]["amount"].sum()
-                cat_list.append({
-                    "Month": m,
-                    "Label": label,
-                    "Total": int(total)
-                })
-        cat_line_df = pd.DataFrame(cat_list)
-        if not cat_line_df.empty:
-            # Main multi-line chart
-            cat_line = alt.Chart(cat_line_df).mark_line(point=True, strokeWidth=3).encode(
-                x=alt.X('Month:N', sort=None, axis=alt.Axis(
-                    labelAngle=-45,
-                    domainColor='white',
-                    tickColor='white',
-                    labelColor='white',
-                    titleColor='white',
-                    gridColor='white',
-                    gridOpacity=0.3
-                )),
-                y=alt.Y('Total:Q', axis=alt.Axis(
-                    domainColor='white',
-                    tickColor='white',
-                    labelColor='white',
-                    titleColor='white',
-                    gridColor='white',
-                    gridOpacity=0.3
-                )),
-                color=alt.Color('Label:N'),
-                tooltip=['Month', 'Label', 'Total']
-            )
-            # Vertical rules at each month
-            months_unique = cat_line_df['Month'].unique().tolist()
-            rule_df = pd.DataFrame({'Month': months_unique})
-            vlines = alt.Chart(rule_df).mark_rule(
-                color='white',
-                strokeDash=[4,2],
-                size=2,
-                opacity=0.4
-            ).encode(
-                x=alt.X('Month:N', sort=None)
-            )
-            cat_line_chart = (cat_line + vlines).properties(
-                width='container',
-                height=400,
-                background="#1C3948"
-            )
-
-
-            st.altair_chart(cat_line_chart, use_container_width=True)
-            st.divider()
-
-            # --- Quick Summary: Category Progress Compared to Previous Month ---
-            if len(cat_line_df['Month'].unique()) > 1:
-                months_sorted = sorted(cat_line_df['Month'].unique(), key=lambda x: (int(x.split()[1]), list(calendar.month_name).index(x.split()[0])))
-                last_month = months_sorted[-1]
-                prev_month = months_sorted[-2]
-                last_df = cat_line_df[cat_line_df['Month'] == last_month].set_index('Label')
-                prev_df = cat_line_df[cat_line_df['Month'] == prev_month].set_index('Label')
-                green_msgs = []
-                red_msgs = []
-                for label in cat_labels:
-                    last_val = last_df.loc[label, 'Total'] if label in last_df.index else 0
-                    prev_val = prev_df.loc[label, 'Total'] if label in prev_df.index else 0
-                    if last_val < prev_val:
-                        diff = prev_val - last_val
-                        green_msgs.append(f"<li style='margin-bottom:0.2em'><span style='color:#4CAF50;font-weight:bold'>{label} ↓ {diff:,}</span></li>")
-                    elif last_val > prev_val:
-                        diff = last_val - prev_val
-                        red_msgs.append(f"<li style='margin-bottom:0.2em'><span style='color:#FF5252;font-weight:bold'>{label} ↑ {diff:,}</span></li>")
-                if green_msgs or red_msgs:
-                    # Prepare change data for plot
-                    change_data = []
-                    for label in cat_labels:
-                        last_val = last_df.loc[label, 'Total'] if label in last_df.index else 0
-                        prev_val = prev_df.loc[label, 'Total'] if label in prev_df.index else 0
-                        diff = last_val - prev_val
-                        change_data.append({"Label": label, "Change": diff})
-                    import altair as alt
-                    change_df = pd.DataFrame(change_data)
-                    # Bar plot: green for decrease, red for increase
-                    change_df["Color"] = change_df["Change"].apply(lambda x: '#4CAF50' if x < 0 else ('#FF5252' if x > 0 else '#E68C3A'))
-                    bar_chart = alt.Chart(change_df).mark_bar(size=35, cornerRadiusTopLeft=8, cornerRadiusTopRight=8).encode(
-                        x=alt.X('Label:N', sort=None, axis=alt.Axis(labelColor='white', titleColor='white', domainColor='white', tickColor='white')),
-                        y=alt.Y('Change:Q', axis=alt.Axis(labelColor='white', titleColor='white', domainColor='white', tickColor='white')),
-                        color=alt.Color('Color:N', scale=None, legend=None),
-                        tooltip=['Label', 'Change']
-                    ).properties(
-                        width=300,
-                        height=220,
-                        background="#22384a",
-                        title=alt.TitleParams(text="Change by Category", color="#E68C3A", fontSize=18, anchor="middle")
-                    )
-                    # Side-by-side layout using Streamlit columns
-                    table_col, plot_col = st.columns([2,1])
-                    with table_col:
-                        st.markdown(
-                            f"""
-                            <div style='margin-top:1em; display:flex; justify-content:flex-start;'>
-                              <div style='border:2px solid #E68C3A; border-radius:10px; background:#22384a; padding:1em 2em; display:flex; min-width:350px; max-width:700px; width:100%;'>
-                                <div style='flex:1; text-align:left; padding-right:1em; border-right:1.5px solid #E68C3A;'>
-                                  <div style='font-size:1.1em; font-weight:bold; margin-bottom:0.5em;'>Expense Decreased 👍</div>
-                                  <ul style='list-style-type:none; padding-left:0; margin:0;'>
-                                    {''.join(green_msgs)}
-                                  </ul>
-                                </div>
-                                <div style='flex:1; text-align:right; padding-left:1em;'>
-                                  <div style='font-size:1.1em; font-weight:bold; margin-bottom:0.5em;'>Expense Increased 👎</div>
-                                  <ul style='list-style-type:none; padding-left:0; margin:0;'>
-                                    {''.join(red_msgs)}
-                                  </ul>
-                                </div>
-                              </div>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
-                    with plot_col:
-                        st.markdown("<div style='margin-top:2.5em'></div>", unsafe_allow_html=True)
-                        st.altair_chart(bar_chart, use_container_width=False)
\ No newline at end of file
+# app.py
+# Streamlit page. All figures come from dashboard.py; this file only lays
+# them out. Sections with their own widgets run as fragments, so using them
+# reruns that section alone instead of the whole page.
+#
+# Only what the headline needs is imported up front; pandas, altair and the
+# modules built on them load after it has been sent, so a cold start paints
+# the month's total first. SPEND_TRACKER_FAST_START=1 also keeps the trend
+# charts behind a toggle until asked for.
+import streamlit as st
+from datetime import datetime
+import calendar
+import functools
+import os
+import re
+import uuid
+import db
+from db import (init_db, validate_expense, LABELS, PAGE_SORT_COLUMNS,
+                parse_period, format_period)
+import writer
+import dashboard
+import cache
+from cache import get_expense_page, get_range_analytics
+import profiling
+
+FAST_START = os.environ.get("SPEND_TRACKER_FAST_START", "0") == "1"
+
+profiling.start_run()
+profiling.begin("init_db")
+
+# One ledger per household, picked with ?ledger=<name> (or SPEND_TRACKER_LEDGER
+# for a single-tenant deployment); without one the shared expenses.db is used.
+# Only existing ledgers open: they are created with manage.py ledgers create
+st.session_state.ledger = st.query_params.get("ledger") or os.environ.get("SPEND_TRACKER_LEDGER")
+try:
+    db.use_ledger(st.session_state.ledger)
+except ValueError as exc:
+    st.error(str(exc))
+    st.stop()
+# Entries are tagged with who added them so "Delete Last Entry" and Undo only
+# touch your own. Signed-in users are known by email, anyone else by a random
+# id kept in a browser cookie so it survives reloads
+VISITOR_COOKIE = "spend_tracker_visitor"
+if "user" not in st.session_state:
+    st.session_state.user = st.user.get("email")
+    if not st.session_state.user:
+        visitor = st.context.cookies.get(VISITOR_COOKIE, "")
+        if not re.fullmatch(r"[0-9a-f]{32}", visitor):
+            visitor = uuid.uuid4().hex
+            st.html(f"<script>document.cookie = '{VISITOR_COOKIE}={visitor}; path=/; max-age=31536000; SameSite=Strict';</script>",
+                    unsafe_allow_javascript=True)
+        st.session_state.user = f"visitor:{visitor}"
+user = st.session_state.user
+
+# Initialize database (migrations run once per ledger per process)
+init_db()
+
+# Background color using custom CSS
+st.markdown(
+    """
+    <style>
+    .stApp {
+        background-color: #1C3948;
+    }
+    [data-testid="stSidebar"] {
+        background-color: #CC8A4D; 
+    }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+# ---- SIDEBAR INPUT FORM ----
+profiling.begin("sidebar")
+st.sidebar.title("Add Expense")
+
+
+# Dropdowns for month and year, covering every year in the ledger; June 2025
+# (when tracking started) stays the default selection
+first_period, last_period = cache.get_period_bounds()
+years = list(range(min(int((first_period or "2025")[:4]), 2025),
+                   max(int((last_period or "2025")[:4]), datetime.now().year) + 1))
+month = st.sidebar.selectbox("Select Month", list(calendar.month_name)[1:], index=5)
+year = st.sidebar.selectbox("Select Year", years, index=years.index(2025))
+date_str = f"{month} {year}"
+period = parse_period(date_str)
+
+
+# ---- HEADLINE ----
+profiling.begin("headline")
+
+# st.title("📊 Monthly Expense Tracker")
+
+# Selected and previous month totals from one rollup query; None when the
+# selected month has no entries
+head = dashboard.headline(period)
+if head is not None:
+    rupee = '&#8377;'
+    st.markdown(f"""
+        <div style='text-align:center; font-size:2em; font-weight:bold; letter-spacing:2px; color:#E68C3A; text-transform:uppercase;'>
+            {month.upper()} {year} EXPENSE: <span style='color:{head["color"]};'>{rupee} {head["total"]:,}</span>
+        </div>
+        <div style='text-align:center; font-size:1.1em; color:#E68C3A; margin-top:0.2em;'>
+            Last month expense: <span style='color:#fff;'>{rupee} {head["prev_total"]:,}</span>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # Add vertical space and a divider for presentation
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.divider()
+
+# Everything below builds frames and charts
+profiling.begin("imports")
+import pandas as pd
+import importer
+import export
+import aggregation
+import charts
+
+
+def session_fragment(fn):
+    # st.fragment for this page: a fragment rerun skips the top of the script
+    # (and may run on a new thread), so point it back at the session's ledger
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        db.use_ledger(st.session_state.ledger)
+        return fn(*args, **kwargs)
+
+    return st.fragment(run)
+
+
+CHANGE_VERBS = {"insert": "adding", "edit": "editing", "delete": "deleting"}
+# Shown when the writer could not get to a request in time; it was cancelled
+BUSY_MESSAGE = "The ledger is busy and nothing was saved. Please try again."
+
+
+@session_fragment
+def expense_form(date_str):
+    with profiling.fragment("expense form"):
+        with st.form("expense_form", clear_on_submit=False):
+            label = st.selectbox("Select Expense Category:", LABELS)
+            col_amt, col_btn = st.columns([2, 1])
+            with col_amt:
+                amount = st.number_input("Enter Amount", min_value=0, step=10, format="%d")
+            with col_btn:
+                st.markdown("<div style='height: 1.8em'></div>", unsafe_allow_html=True)
+                submitted = st.form_submit_button("Add")
+            comment = st.text_input("Comment (optional)" if label != "Non-Essentials" else "Comment (required)")
+
+        # Writes go through the background writer; new data changes every
+        # section, so once acknowledged they rerun the whole page
+        if submitted:
+            error = validate_expense(date_str, label, amount, comment)
+            if error:
+                st.warning(error)
+            else:
+                try:
+                    ack = writer.insert_expense(date_str, label, amount, comment.strip(), user)
+                except TimeoutError:
+                    st.warning(BUSY_MESSAGE)
+                else:
+                    st.session_state.last_write = f"Saved {label} {amount:,} for {date_str} (entry #{ack['result']})."
+                    st.rerun()
+
+        # Delete last entry
+        if st.button("Delete Last Entry"):
+            try:
+                ack = writer.delete_last_expense(user)
+            except TimeoutError:
+                st.warning(BUSY_MESSAGE)
+            else:
+                st.session_state.last_write = "Deleted your last entry." if ack["result"] else "You have no entries to delete."
+                st.rerun()
+
+        # Step back and forth through this user's own adds, edits and deletes
+        undo_col, redo_col = st.columns(2)
+        with undo_col:
+            undo = st.button("Undo", key="undo", use_container_width=True)
+        with redo_col:
+            redo = st.button("Redo", key="redo", use_container_width=True)
+        if undo or redo:
+            try:
+                ack = writer.undo(user) if undo else writer.redo(user)
+            except ValueError as exc:
+                st.warning(str(exc))
+            except TimeoutError:
+                st.warning(BUSY_MESSAGE)
+            else:
+                step = ack["result"]
+                if step is None:
+                    st.session_state.last_write = f"Nothing to {'undo' if undo else 'redo'}."
+                else:
+                    st.session_state.last_write = (f"{'Undid' if undo else 'Redid'} {CHANGE_VERBS[step['kind']]} "
+                                                   f"entry #{step['expense_id']}.")
+                st.rerun()
+
+        last_write = st.session_state.pop("last_write", None)
+        if last_write:
+            st.caption(last_write)
+
+
+@session_fragment
+def bulk_import():
+    # Bulk import from a CSV / bank statement export
+    with profiling.fragment("bulk import"), st.expander("Bulk Import"):
+        upload = st.file_uploader("CSV file", type=["csv"], key="bulk_import_file")
+        if upload is not None and st.button("Import", key="bulk_import_run"):
+            progress = st.progress(0.0)
+
+            def show_progress(result):
+                progress.progress(min(upload.tell() / max(upload.size, 1), 1.0),
+                                  text=f"{result['inserted']:,} imported · {result['rows_per_sec']:,.0f} rows/s")
+
+            st.session_state.bulk_import_result = importer.import_csv(upload, progress=show_progress, user=user)
+            # Imported rows change every section, so rerun the whole page
+            if st.session_state.bulk_import_result["inserted"]:
+                st.rerun()
+
+        result = st.session_state.pop("bulk_import_result", None)
+        if result is not None:
+            st.success(f"Imported {result['inserted']:,} of {result['read']:,} rows "
+                       f"({result['duplicates']:,} duplicates skipped, {len(result['rejected']):,} rejected).")
+            if result["rejected"]:
+                st.dataframe(pd.DataFrame(result["rejected"][:100], columns=["Line", "Reason"]), hide_index=True)
+
+
+with st.sidebar:
+    expense_form(date_str)
+    bulk_import()
+
+
+def month_sections(label_totals_matrix, group_totals_matrix):
+    group_totals = aggregation.month_row(group_totals_matrix, period)
+    month_labels = aggregation.month_row(label_totals_matrix, period)
+
+    profiling.begin("summary totals")
+    st.markdown("<h3 style='text-align:left; color:#fff; font-weight:bold;'>Summary Totals</h3>", unsafe_allow_html=True)
+    col1, col2 = st.columns([2,2])
+
+    with col1:
+        summary_df = dashboard.summary_table(group_totals)
+        st.table(profiling.payload("summary table", summary_df))
+        st.download_button(
+            label=" Download",
+            data=lambda df=summary_df: df.to_csv(index=False).encode('utf-8'),
+            file_name=f'summary_totals_{date_str.replace(" ", "_")}.csv',
+            mime='text/csv'
+        )
+
+    with col2:
+        pie_df = summary_df[summary_df["Category"] != "Total"]
+        st.vega_lite_chart(profiling.payload("summary donut", charts.donut(pie_df, "Category")), use_container_width=True)
+
+
+    # Expense Category Totals table and pie chart side by side
+
+    profiling.begin("category totals")
+    st.markdown("<h3 style='text-align:left; color:#fff; font-weight:bold;'>Expense Category Totals</h3>", unsafe_allow_html=True)
+    cat_col1, cat_col2 = st.columns([2,2])
+
+    with cat_col1:
+        label_totals = dashboard.label_table(month_labels)
+        st.table(profiling.payload("category table", label_totals))
+
+    with cat_col2:
+        if not label_totals.empty:
+            st.vega_lite_chart(profiling.payload("category donut", charts.donut(label_totals, "Label")), use_container_width=True)
+
+
+    # Essentials vs Non-Essentials Table and Pie Chart side by side
+    profiling.begin("essentials vs non-essentials")
+    st.divider()
+    essentials_vs_non_df = dashboard.essentials_table(group_totals)
+    # Merged right-aligned section title above both columns
+    st.markdown("<h3 style='text-align:right; color:#fff; font-weight:bold;'>Essentials vs Non-Essentials</h3>", unsafe_allow_html=True)
+    ess_col1, ess_col2 = st.columns([2,2])
+    with ess_col1:
+        st.vega_lite_chart(profiling.payload("essentials donut", charts.donut(essentials_vs_non_df, "Category")), use_container_width=True)
+    with ess_col2:
+        st.table(profiling.payload("essentials table", essentials_vs_non_df))
+    st.divider()
+
+    # All entries table as dropdown with label filter, one keyset page at a time
+    entries(period, date_str, month_labels)
+
+
+@session_fragment
+def entries(period, date_str, month_labels):
+    with profiling.fragment("entries"):
+        # Entries (and their comments) are only queried while the expander is open
+        expander = st.expander(f"All Entries for {date_str}", key="entries_open", on_change="rerun")
+        if not expander.open:
+            return
+        with expander:
+            label_options = ["All"] + sorted(month_labels[month_labels != 0].index.tolist())
+            filter_col, sort_col, order_col, size_col = st.columns([2, 2, 1, 1])
+            with filter_col:
+                selected_label = st.selectbox("Filter by Label", label_options, key="all_entries_label_filter")
+            with sort_col:
+                sort_by = st.selectbox("Sort by", PAGE_SORT_COLUMNS, key="all_entries_sort")
+            with order_col:
+                descending = st.toggle("Newest / largest first", value=True, key="all_entries_desc")
+            with size_col:
+                page_size = st.selectbox("Rows", [25, 50, 100, 250], index=1, key="all_entries_page_size")
+            label_filter = None if selected_label == "All" else selected_label
+
+            # Cursor stack for the current query; reset whenever any input changes
+            page_query = (period, label_filter, sort_by, descending, page_size)
+            if st.session_state.get("entries_query") != page_query:
+                st.session_state.entries_query = page_query
+                st.session_state.entries_cursors = []
+            cursors = st.session_state.entries_cursors
+            page = get_expense_page(date_str, label_filter, sort_by, descending, page_size,
+                                    after=cursors[-1] if cursors else None)
+
+            total_amt = int(month_labels[label_filter] if label_filter else month_labels.sum())
+            st.markdown(f"**Total Amount: <span style='color:#E68C3A;font-size:1.2em'>{total_amt:,}</span>**", unsafe_allow_html=True)
+            df_to_show = page.drop(columns="id")
+            df_to_show.index = range(len(cursors) * page_size + 1, len(cursors) * page_size + len(page) + 1)
+            st.dataframe(profiling.payload("entries page", df_to_show), use_container_width=True)
+
+            def next_page(last=next(page[[sort_by, "id"]].tail(1).itertuples(index=False, name=None), None)):
+                st.session_state.entries_cursors.append(last)
+
+            def prev_page():
+                st.session_state.entries_cursors.pop()
+
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                st.button("‹ Prev", on_click=prev_page, disabled=not cursors, key="entries_prev")
+            with page_col:
+                st.caption(f"Page {len(cursors) + 1}")
+            with next_col:
+                st.button("Next ›", on_click=next_page, disabled=len(page) < page_size, key="entries_next")
+
+            edit_entry(page, date_str)
+
+            # Add download button for filtered table; streamed from SQLite on click
+            st.download_button(
+                label="D",
+                data=lambda p=period, l=label_filter, path=db.current_ledger(): export.export_file(
+                    "csv", start=p, end=p, label=l, path=path),
+                file_name=f'all_entries_{date_str.replace(" ", "_")}_{selected_label}.csv',
+                mime='text/csv'
+            )
+
+
+def edit_entry(page, date_str):
+    # Edit or delete any entry on the current page; like the sidebar form,
+    # writes go through the background writer and rerun the whole page
+    entry_message = st.session_state.pop("entry_message", None)
+    if entry_message:
+        st.session_state.entries_edit_id = None
+        st.caption(entry_message)
+    if page.empty:
+        return
+    rows = {row.id: row for row in page.itertuples(index=False)}
+    expense_id = st.selectbox("Edit entry", [None] + list(rows), key="entries_edit_id",
+                              format_func=lambda i: "—" if i is None else
+                              f"#{i} · {rows[i].label} · {rows[i].amount:,} · {rows[i].comment or ''}")
+    if expense_id is None:
+        return
+    row = rows[expense_id]
+    with st.form(f"edit_entry_{expense_id}"):
+        label = st.selectbox("Category", LABELS, index=LABELS.index(row.label) if row.label in LABELS else 0)
+        # Seeded with the stored amount, paise included (imported entries
+        # need not be whole rupees)
+        amount = st.number_input("Amount", min_value=0.0, step=10.0, format="%.2f", value=float(row.amount))
+        comment = st.text_input("Comment", value=row.comment or "")
+        save_col, delete_col = st.columns(2)
+        with save_col:
+            save = st.form_submit_button("Save changes")
+        with delete_col:
+            delete = st.form_submit_button("Delete entry")
+    if save:
+        error = validate_expense(date_str, label, amount, comment)
+        if error:
+            st.warning(error)
+            return
+        # An untouched amount is written back exactly as stored
+        if amount == round(float(row.amount), 2):
+            amount = row.amount
+        try:
+            writer.edit_expense(expense_id, label, amount, comment.strip(), user)
+        except TimeoutError:
+            st.warning(BUSY_MESSAGE)
+            return
+        st.session_state.entry_message = f"Saved entry #{expense_id}."
+    elif delete:
+        try:
+            writer.delete_expense(expense_id, user)
+        except TimeoutError:
+            st.warning(BUSY_MESSAGE)
+            return
+        st.session_state.entry_message = f"Deleted entry #{expense_id}."
+    else:
+        return
+    st.rerun()
+
+
+@session_fragment
+def trend_sections():
+    # Independent of the selected month; reads only the shared matrices.
+    # In fast-start mode nothing is computed until the toggle is switched on
+    with profiling.fragment("trends"):
+        if FAST_START and not st.toggle("Show trends", key="show_trends"):
+            return
+        label_totals_matrix, group_totals_matrix = dashboard.matrices()
+
+        # --- Multi-Line Chart for Summary Totals for All Months ---
+        profiling.begin("month to month chart")
+        st.divider()
+        st.markdown("<h3 style='text-align:center; color:#fff; font-weight:bold;'>📈 Month to Month Analysis</h3>", unsafe_allow_html=True)
+        line_df = dashboard.group_trend(group_totals_matrix)
+        if not line_df.empty:
+            line_chart = charts.trend(line_df, "Category")
+            st.vega_lite_chart(profiling.payload("month to month chart", line_chart), use_container_width=True)
+
+        # --- Multi-Line Chart for Expense Category Totals Table ---
+        profiling.begin("category trend chart")
+        st.divider()
+        st.markdown("<h3 style='text-align:center; color:#fff; font-weight:bold;'>📈 Category Totals by Month</h3>", unsafe_allow_html=True)
+        cat_line_df = dashboard.label_trend(label_totals_matrix)
+        if cat_line_df.empty:
+            return
+        cat_line_chart = charts.trend(cat_line_df, "Label")
+        st.vega_lite_chart(profiling.payload("category trend chart", cat_line_chart), use_container_width=True)
+        st.divider()
+
+        # --- Quick Summary: Category Progress Compared to Previous Month ---
+        profiling.begin("change summary")
+        change = dashboard.month_change(label_totals_matrix)
+        if change is None or not (change["decreased"] or change["increased"]):
+            return
+        green_msgs = [f"<li style='margin-bottom:0.2em'><span style='color:#4CAF50;font-weight:bold'>{label} ↓ {diff:,}</span></li>"
+                      for label, diff in change["decreased"]]
+        red_msgs = [f"<li style='margin-bottom:0.2em'><span style='color:#FF5252;font-weight:bold'>{label} ↑ {diff:,}</span></li>"
+                    for label, diff in change["increased"]]
+        bar_chart = charts.change_bars(change["frame"])
+        # Side-by-side layout using Streamlit columns
+        table_col, plot_col = st.columns([2,1])
+        with table_col:
+            st.markdown(
+                f"""
+                <div style='margin-top:1em; display:flex; justify-content:flex-start;'>
+                  <div style='border:2px solid #E68C3A; border-radius:10px; background:#22384a; padding:1em 2em; display:flex; min-width:350px; max-width:700px; width:100%;'>
+                    <div style='flex:1; text-align:left; padding-right:1em; border-right:1.5px solid #E68C3A;'>
+                      <div style='font-size:1.1em; font-weight:bold; margin-bottom:0.5em;'>Expense Decreased 👍</div>
+                      <ul style='list-style-type:none; padding-left:0; margin:0;'>
+                        {''.join(green_msgs)}
+                      </ul>
+                    </div>
+                    <div style='flex:1; text-align:right; padding-left:1em;'>
+                      <div style='font-size:1.1em; font-weight:bold; margin-bottom:0.5em;'>Expense Increased 👎</div>
+                      <ul style='list-style-type:none; padding-left:0; margin:0;'>
+                        {''.join(red_msgs)}
+                      </ul>
+                    </div>
+                  </div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+        with plot_col:
+            st.markdown("<div style='margin-top:2.5em'></div>", unsafe_allow_html=True)
+            st.vega_lite_chart(profiling.payload("change bar chart", bar_chart), use_container_width=False)
+
+
+@session_fragment
+def range_sections(first_period, last_period):
+    # Any span of months: group totals with rolling averages, year-over-year
+    # change and running totals, all from one window-function query
+    with profiling.fragment("date range"):
+        expander = st.expander("Date Range Analysis", key="range_open", on_change="rerun")
+        if not expander.open:
+            return
+        with expander:
+            options = [db.index_period(i)
+                       for i in range(db.period_index(first_period), db.period_index(last_period) + 1)]
+            if len(options) > 1:
+                start, end = st.select_slider(
+                    "Months", options=options, value=(options[max(len(options) - 12, 0)], options[-1]),
+                    format_func=format_period, key="range_months")
+            else:
+                start = end = options[0]
+            metric = st.radio("Show", list(dashboard.RANGE_METRICS), horizontal=True, key="range_metric")
+            frame = get_range_analytics(start, end)
+            st.table(profiling.payload("range table", dashboard.range_summary(frame)))
+            trend = dashboard.range_trend(frame, dashboard.RANGE_METRICS[metric])
+            st.vega_lite_chart(profiling.payload("range chart", charts.trend(trend, "Category")),
+                               use_container_width=True)
+
+
+# ---- MAIN SECTION ----
+profiling.begin("matrices")
+
+label_totals_matrix, group_totals_matrix = dashboard.matrices()
+
+if label_totals_matrix.empty:
+    st.info("No data available yet.")
+elif head is None:
+    st.warning(f"No records for {date_str}")
+else:
+    month_sections(label_totals_matrix, group_totals_matrix)
+    trend_sections()
+
+if first_period is not None:
+    range_sections(first_period, last_period)
+
+
+@session_fragment
+def export_panel(export_periods):
+    # Full-history / date-range export, generated only when downloaded
+    with profiling.fragment("sidebar export"), st.expander("Export"):
+        if not export_periods:
+            st.caption("Nothing to export yet.")
+            return
+        start_period, end_period = st.select_slider(
+            "Months", options=export_periods, value=(export_periods[0], export_periods[-1]),
+            format_func=format_period, key="export_range")
+        export_fmt = st.radio("Format", list(export.FORMATS), horizontal=True, key="export_format")
+        st.download_button(
+            label="Download",
+            data=lambda f=export_fmt, a=start_period, b=end_period, path=db.current_ledger(): export.export_file(
+                f, start=a, end=b, path=path),
+            file_name=export.file_name(export_fmt, start_period, end_period),
+            mime=export.FORMATS[export_fmt][0],
+            key="export_download",
+        )
+
+
+with st.sidebar:
+    export_panel(list(label_totals_matrix.index))
+
+    # Cache hit/miss counters for this server process
+    profiling.begin("cache stats")
+    with st.expander("Cache stats"):
+        stats = cache.stats()
+        st.caption(f"Hit rate {stats['hit_rate']:.0%} · {stats['hits']} hits · "
+                   f"{stats['misses']} misses · {stats['deltas']} delta updates · {stats['entries']} entries")
+        st.dataframe(pd.DataFrame(stats["functions"]), hide_index=True)
+        chart_stats = charts.stats()
+        st.caption(f"Chart specs: {chart_stats['hits']} hits · {chart_stats['misses']} builds · "
+                   f"{chart_stats['entries']} cached")
+
+# Per-rerun timings; the panel is shown with ?debug=1
+run = profiling.finish_run()
+if run is not None and st.query_params.get("debug") == "1":
+    with st.expander("Debug: render profile", expanded=True):
+        st.caption(f"Rerun {run['total_ms']:.1f} ms · db {run['db_ms']:.1f} ms in {len(run['db_calls'])} calls · "
+                   f"{run['rows_fetched']:,} rows fetched · {run['payload_bytes']:,} payload bytes")
+        sections_col, db_col, payload_col = st.columns(3)
+        with sections_col:
+            st.dataframe(pd.DataFrame(run["sections"]).round(2), hide_index=True)
+        with db_col:
+            st.dataframe(pd.DataFrame(run["db_calls"], columns=["call", "ms", "rows"]).round(2), hide_index=True)
+        with payload_col:
+            st.dataframe(pd.DataFrame(run["payloads"], columns=["element", "bytes"]), hide_index=True)
@@ -0,0 +1,663 @@
+# benchmark.py
+# Throughput benchmarks for the tracker. Runs against a throwaway database,
+# never the real expenses.db.
+#
+#   python benchmark.py concurrency --sessions 8 --ops 500
+#   python benchmark.py writes --sessions 4 16 64 --ops 200
+#   python benchmark.py tenants --small 5000 --large 1000000
+#   python benchmark.py import --rows 200000
+#   python benchmark.py groups --rows 10000 100000 1000000
+#   python benchmark.py export --rows 100000 500000
+#   python benchmark.py memory --rows 100000 1000000
+#   python benchmark.py startup --rows 100000 --repeat 3
+#   python benchmark.py ranges --rows 1000000 --spans 1 12 36 120
+#   python benchmark.py deltas --rows 100000 1000000
+#   python benchmark.py suite --rows 10000 100000 1000000 --out results.json
+#   python benchmark.py compare before.json after.json
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import aggregation
+import cache
+import charts
+import dashboard
+import db
+import export
+import importer
+import profiling
+import writer
+
+LABELS = db.LABELS
+
+
+def use_temp_db():
+    tmpdir = tempfile.mkdtemp(prefix="expenses_bench_")
+    db.close_all()
+    db.DB_NAME = os.path.join(tmpdir, "bench.db")
+    db.init_db()
+    return db.DB_NAME
+
+
+def _run_sessions(sessions, target):
+    start = threading.Barrier(sessions + 1)
+    threads = [threading.Thread(target=target, args=(i, start)) for i in range(sessions)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def bench_concurrency(sessions, ops):
+    use_temp_db()
+
+    def writer(i, start):
+        start.wait()
+        for n in range(ops):
+            db.insert_expense("July 2025", LABELS[n % len(LABELS)], 100 + n, f"session {i}")
+
+    elapsed = _run_sessions(sessions, writer)
+    writes = sessions * ops
+    print(f"inserts: {writes} rows from {sessions} sessions in {elapsed:.2f}s "
+          f"({writes / elapsed:,.0f} rows/s)")
+
+    def reader(i, start):
+        start.wait()
+        for _ in range(ops // 10 or 1):
+            db.get_all_expenses()
+
+    elapsed = _run_sessions(sessions, reader)
+    reads = sessions * (ops // 10 or 1)
+    print(f"reads:   {reads} full reads from {sessions} sessions in {elapsed:.2f}s "
+          f"({reads / elapsed:,.1f} reads/s)")
+
+    def mixed(i, start):
+        start.wait()
+        for n in range(ops // 10 or 1):
+            if i % 2:
+                db.insert_expense("August 2025", "Fuel", 200, "")
+            else:
+                db.get_all_expenses()
+
+    elapsed = _run_sessions(sessions, mixed)
+    print(f"mixed:   {sessions} sessions (half readers, half writers) in {elapsed:.2f}s")
+    db.close_all()
+
+
+def _hold_write_lock(path, stop, hold_ms):
+    # Another process's writer: takes the file lock for hold_ms at a time
+    conn = sqlite3.connect(path, isolation_level=None)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold_ms / 1000)
+        conn.execute("COMMIT")
+        time.sleep(hold_ms / 1000)
+    conn.close()
+
+
+def bench_writes(session_counts, ops, hold_ms):
+    # Sustained writes/sec with many sessions submitting at once: a commit per
+    # insert vs the background writer's group commits
+    for sessions in session_counts:
+        for mode in ("direct", "queued"):
+            path = use_temp_db()
+            stop = threading.Event()
+            contender = None
+            if hold_ms:
+                contender = threading.Thread(target=_hold_write_lock, args=(path, stop, hold_ms))
+                contender.start()
+            latencies = [[] for _ in range(sessions)]
+
+            def session(i, start):
+                start.wait()
+                for n in range(ops):
+                    t0 = time.perf_counter()
+                    if mode == "direct":
+                        db.insert_expense("July 2025", LABELS[n % len(LABELS)], 100 + n, f"session {i}")
+                    else:
+                        writer.insert_expense("July 2025", LABELS[n % len(LABELS)], 100 + n, f"session {i}")
+                    latencies[i].append((time.perf_counter() - t0) * 1000)
+
+            elapsed = _run_sessions(sessions, session)
+            stop.set()
+            if contender is not None:
+                contender.join()
+            stats = writer.get_writer(path).stats if mode == "queued" else None
+            writer.close_all()
+            with db.get_pool().reader() as conn:
+                stored = conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+            db.close_all()
+
+            writes = sessions * ops
+            p50, p95 = np.percentile(np.concatenate(latencies), [50, 95])
+            line = (f"{mode:>6} {sessions:>3} sessions: {writes / elapsed:>8,.0f} writes/s  "
+                    f"p50 {p50:6.2f} ms  p95 {p95:7.2f} ms  ({stored:,}/{writes:,} stored)")
+            if stats:
+                line += (f"  {stats['batches']:,} commits, avg batch {stats['requests'] / stats['batches']:.1f}, "
+                         f"max {stats['max_batch']}, {stats['retries']} retries")
+            print(line)
+
+
+def bench_import(rows, chunk_size):
+    path = use_temp_db()
+    csv_path = os.path.join(os.path.dirname(path), "import.csv")
+    rng = random.Random(42)
+    with open(csv_path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["date_str", "label", "amount", "comment"])
+        for n in range(rows):
+            label = LABELS[n % len(LABELS)]
+            month = f"{['January', 'April', 'July', 'October'][n % 4]} {2015 + n % 10}"
+            out.writerow([month, label, rng.randint(10, 5000), f"item {n}"])
+
+    baseline_rows = min(rows, 2000)
+    t0 = time.perf_counter()
+    for n in range(baseline_rows):
+        db.insert_expense("July 2025", "Fuel", 100, f"row {n}")
+    baseline = baseline_rows / (time.perf_counter() - t0)
+    print(f"row-at-a-time insert_expense: {baseline:,.0f} rows/s ({baseline_rows} rows)")
+
+    result = importer.import_csv(csv_path, chunk_size=chunk_size)
+    print(f"bulk import:                  {result['rows_per_sec']:,.0f} rows/s "
+          f"({result['inserted']:,} rows in {result['seconds']:.2f}s, chunk {chunk_size:,})")
+
+    result = importer.import_csv(csv_path, chunk_size=chunk_size)
+    print(f"re-import (all duplicates):   {result['rows_per_sec']:,.0f} rows/s "
+          f"({result['duplicates']:,} skipped)")
+    db.close_all()
+
+
+# Rough share of entries per label in a real household ledger
+LABEL_WEIGHTS = [0.25, 0.15, 0.08, 0.22, 0.15, 0.05, 0.10]
+# Synthetic ledgers end here, a month the dashboard's selectors offer
+LAST_PERIOD = "2025-12"
+
+
+def synthetic_chunks(rows, months=36, seed=42, chunk_size=100_000):
+    # Deterministic ledger rows as DataFrames of at most chunk_size rows, so
+    # 10M-row ledgers can be generated without holding them in memory
+    rng = np.random.default_rng(seed)
+    periods = np.array([db.shift_period(LAST_PERIOD, m - months + 1) for m in range(months)])
+    labels = np.array(LABELS)
+    for start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        label = labels[rng.choice(len(labels), n, p=LABEL_WEIGHTS)]
+        amount = np.round(rng.lognormal(5.5, 0.9, n)).clip(10, 50_000)
+        comment = np.where(label == "Non-Essentials",
+                           np.char.add("item ", np.arange(start, start + n).astype(str)), "")
+        yield pd.DataFrame({
+            "period": periods[rng.integers(0, months, n)],
+            "label": label,
+            "amount": amount,
+            "comment": comment,
+        })
+
+
+def _synthetic_rows(rows, months=36, seed=42):
+    return pd.concat(synthetic_chunks(rows, months, seed), ignore_index=True)
+
+
+def load_synthetic_ledger(rows, months=36, seed=42):
+    date_strs = {}
+    for chunk in synthetic_chunks(rows, months, seed):
+        for p in chunk["period"].unique():
+            date_strs.setdefault(p, db.format_period(p))
+        db.insert_expenses(zip(chunk["period"].map(date_strs), chunk["label"],
+                               chunk["amount"].tolist(), chunk["comment"]))
+
+
+def bench_tenants(small, large, months):
+    # Dashboard reads for a small household before and after a large one is
+    # loaded into the same deployment; with a file per ledger they should match
+    use_temp_db()
+    db.LEDGER_DIR = os.path.join(os.path.dirname(db.DB_NAME), "ledgers")
+
+    def dashboard_reads():
+        return _best_of(lambda: (db.get_label_totals(), db.get_monthly_totals(),
+                                 db.get_expense_page(db.format_period(LAST_PERIOD))))
+
+    db.use_ledger("small", create=True)
+    db.init_db()
+    load_synthetic_ledger(small, months)
+    alone = dashboard_reads()
+
+    db.use_ledger("large", create=True)
+    db.init_db()
+    load_synthetic_ledger(large, months, seed=7)
+    large_reads = dashboard_reads()
+
+    db.use_ledger("small")
+    shared = dashboard_reads()
+    print(f"small ledger ({small:,} rows), alone:          {alone * 1000:8.2f} ms")
+    print(f"small ledger, next to {large:,} rows:  {shared * 1000:8.2f} ms")
+    print(f"large ledger ({large:,} rows):            {large_reads * 1000:8.2f} ms")
+    db.use_ledger(None)
+    db.close_all()
+
+
+def bench_ranges(row_counts, months, spans):
+    # Range analytics latency by span length; each query reads the rollup
+    # rows inside the range, so a multi-year span should cost about the same
+    # as a single month
+    last = LAST_PERIOD
+    print(f"{'rows':>10}  {'span':>8}  {'query':>9}  {'result rows':>11}")
+    for rows in row_counts:
+        use_temp_db()
+        load_synthetic_ledger(rows, months)
+        for span in spans:
+            first = db.shift_period(last, 1 - span)
+            seconds = _best_of(lambda: db.get_range_analytics(first, last), repeat=5)
+            result = db.get_range_analytics(first, last)
+            print(f"{rows:>10,}  {span:>5} mo  {seconds * 1000:>7.2f}ms  {len(result):>11,}")
+        db.close_all()
+
+
+def bench_deltas(row_counts, months, edits):
+    # Dashboard matrices after a single-entry edit: brought up to date from
+    # the change log vs recomputed from the whole rollup
+    print(f"{'rows':>10}  {'full recompute':>15}  {'from log delta':>15}  {'speedup':>8}")
+    for rows in row_counts:
+        use_temp_db()
+        load_synthetic_ledger(rows, months)
+        with db.get_pool().reader() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM expenses ORDER BY random() LIMIT ?", (edits,))]
+        cache.clear()
+        dashboard.matrices()
+        full, delta = [], []
+        for n, expense_id in enumerate(ids):
+            db.edit_expense(expense_id, LABELS[n % len(LABELS)], 100 + n, "edited")
+            seconds, incremental = _timed(dashboard.matrices)
+            delta.append(seconds)
+            cache.clear()
+            seconds, rebuilt = _timed(dashboard.matrices)
+            full.append(seconds)
+            pd.testing.assert_frame_equal(incremental[0], rebuilt[0])
+        full_ms, delta_ms = np.median(full) * 1000, np.median(delta) * 1000
+        print(f"{rows:>10,}  {full_ms:>13.2f}ms  {delta_ms:>13.2f}ms  {full_ms / delta_ms:>7.1f}x")
+        db.close_all()
+
+
+def _masked_group_totals(df):
+    # The per-month isin/== mask approach app.py used before aggregation.py
+    out = {}
+    for m in sorted(df["period"].unique()):
+        month_df = df[df["period"] == m]
+        out[m] = {
+            group: int(month_df[month_df["label"].isin(labels)]["amount"].sum())
+            for group, labels in aggregation.CATEGORY_GROUPS.items()
+        }
+    return out
+
+
+def _best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_groups(row_counts):
+    print(f"{'rows':>10}  {'isin masks':>12}  {'single pass':>12}  {'speedup':>8}")
+    for rows in row_counts:
+        df = _synthetic_rows(rows)
+        masked = _best_of(lambda: _masked_group_totals(df))
+        vectorized = _best_of(lambda: aggregation.group_matrix(aggregation.label_matrix(df, value="amount")))
+        print(f"{rows:>10,}  {masked * 1000:>10.1f}ms  {vectorized * 1000:>10.1f}ms  {masked / vectorized:>7.1f}x")
+
+
+def _peak_mb(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6, elapsed
+
+
+def bench_export(row_counts):
+    print(f"{'rows':>10}  {'in-memory to_csv':>22}  {'streamed csv':>20}  {'streamed parquet':>20}")
+    for rows in row_counts:
+        use_temp_db()
+        load_synthetic_ledger(rows)
+
+        # The pre-streaming export: the whole table read as pandas returns it
+        def in_memory():
+            with db.get_pool().reader() as conn:
+                df = pd.read_sql_query("SELECT * FROM expenses ORDER BY timestamp DESC", conn)
+            df[export.EXPORT_COLUMNS].to_csv(index=False).encode("utf-8")
+
+        results = [
+            _peak_mb(in_memory),
+            _peak_mb(lambda: export.export_file("csv").close()),
+            _peak_mb(lambda: export.export_file("parquet").close()),
+        ]
+        print(f"{rows:>10,}  " + "  ".join(f"{mb:>10.1f}MB {sec:>6.2f}s".rjust(20) for mb, sec in results))
+    db.close_all()
+
+
+def bench_memory(row_counts, months):
+    # In-process size of a full ledger read: SELECT * as pandas returns it vs
+    # the compact frame (with and without comments)
+    print(f"{'rows':>10}  {'read':<28} {'bytes/row':>10} {'total MB':>9} {'seconds':>8}")
+    for rows in row_counts:
+        use_temp_db()
+        load_synthetic_ledger(rows, months)
+        with db.get_pool().reader() as conn:
+            reads = [
+                ("SELECT * (before)", lambda: pd.read_sql_query("SELECT * FROM expenses ORDER BY timestamp DESC", conn)),
+                ("compact", db.get_all_expenses),
+                ("compact + comments", lambda: db.get_all_expenses(comments=True)),
+            ]
+            for name, read in reads:
+                seconds, df = _timed(read)
+                size = int(df.memory_usage(deep=True).sum())
+                print(f"{rows:>10,}  {name:<28} {size / rows:>10.1f} {size / 1e6:>9.1f} {seconds:>8.2f}")
+                del df
+        db.close_all()
+
+
+# Runs in a fresh interpreter so nothing is imported or cached yet. Streamlit's
+# test harness is loaded before the clock starts; the app's own imports are
+# part of the measured run.
+_STARTUP_PROBE = """
+import json, sys, time
+from datetime import datetime
+from streamlit.testing.v1 import AppTest
+
+app_path, log_path = sys.argv[1:3]
+app = AppTest.from_file(app_path, default_timeout=600)
+wall, t0 = time.time(), time.perf_counter()
+app.run()
+cold = time.perf_counter() - t0
+t0 = time.perf_counter()
+app.run()
+warm = time.perf_counter() - t0
+with open(log_path, encoding="utf-8") as f:
+    run = json.loads(f.readline())
+print(json.dumps({"wall": wall, "cold": cold, "warm": warm, "run": run,
+                  "started": datetime.fromisoformat(run["started"]).timestamp(),
+                  "error": app.exception[0].message if app.exception else None}))
+"""
+
+
+def _startup_probe(tmpdir, fast):
+    log_path = os.path.join(tmpdir, "profile.jsonl")
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    env = {**os.environ, "SPEND_TRACKER_PROFILE": "1", "SPEND_TRACKER_PROFILE_LOG": log_path,
+           "SPEND_TRACKER_FAST_START": "1" if fast else "0"}
+    env.pop("SPEND_TRACKER_LEDGER", None)
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, app_path, log_path], cwd=tmpdir, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    probe = json.loads(out.strip().splitlines()[-1])
+    if probe["error"]:
+        raise RuntimeError(f"app.py raised during benchmark: {probe['error']}")
+    # First paint: the end of the headline section, counted from the start
+    # of the run (so including the app's module imports)
+    sections = probe["run"]["sections"]
+    names = [section["section"] for section in sections]
+    upto = names.index("headline") + 1 if "headline" in names else len(sections)
+    first_paint = probe["started"] - probe["wall"] + sum(section["ms"] for section in sections[:upto]) / 1000
+    return {"first_paint": first_paint, "cold": probe["cold"], "warm": probe["warm"]}
+
+
+def bench_startup(row_counts, months, repeat):
+    # Cold start of app.py in a new process: time to the headline, the full
+    # first run and a warm rerun, in the default and fast-start modes
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        print("streamlit not installed; nothing to measure")
+        return
+    print(f"{'rows':>10}  {'mode':<8} {'first paint':>12} {'cold run':>10} {'warm rerun':>11}")
+    for rows in row_counts:
+        path = use_temp_db()
+        load_synthetic_ledger(rows, months)
+        db.close_all()
+        # app.py opens expenses.db in its working directory
+        os.replace(path, os.path.join(os.path.dirname(path), "expenses.db"))
+        for fast in (False, True):
+            probes = [_startup_probe(os.path.dirname(path), fast) for _ in range(repeat)]
+            best = {key: min(p[key] for p in probes) for key in probes[0]}
+            print(f"{rows:>10,}  {'fast' if fast else 'default':<8} {best['first_paint'] * 1000:>10.0f}ms "
+                  f"{best['cold'] * 1000:>8.0f}ms {best['warm'] * 1000:>9.0f}ms")
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _app_rerun_profile(tmpdir):
+    # Runs app.py headless with Streamlit's AppTest and returns the profiling
+    # records of a cold and a warm (cached) rerun
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+    log_path = os.path.join(tmpdir, "profile.jsonl")
+    profiling.LOG_PATH = log_path
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"),
+                            default_timeout=600)
+    month, year = db.format_period(LAST_PERIOD).split()
+    app.run()
+    app.sidebar.selectbox[0].set_value(month)
+    app.sidebar.selectbox[1].set_value(int(year))
+    cache.clear()
+    charts.clear()
+    app.run()
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"app.py raised during benchmark: {app.exception[0].message}")
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    return records[-2], records[-1]
+
+
+def bench_suite(row_counts, months, seed, single_inserts, max_full_read, run_app, out):
+    results = []
+
+    def record(rows, name, seconds, **extra):
+        results.append({"rows": rows, "name": name, "seconds": seconds, **extra})
+        detail = "  ".join(f"{k}={v:,.0f}" if isinstance(v, (int, float)) else f"{k}={v}" for k, v in extra.items())
+        print(f"{rows:>12,}  {name:<34} {seconds * 1000:>12.2f}ms  {detail}", flush=True)
+
+    print(f"{'rows':>12}  {'benchmark':<34} {'time':>14}")
+    for rows in row_counts:
+        tmpdir = tempfile.mkdtemp(prefix="expenses_suite_")
+        db.close_all()
+        db.DB_NAME = os.path.join(tmpdir, "suite.db")
+
+        record(rows, "init_db (fresh)", _timed(db.init_db)[0])
+        seconds, _ = _timed(lambda: load_synthetic_ledger(rows, months, seed))
+        record(rows, "bulk insert (insert_expenses)", seconds, rows_per_sec=rows / seconds)
+        # As a new process opening the ledger: init_db skips files it has seen
+        db.close_all()
+        record(rows, "init_db (existing)", _timed(db.init_db)[0])
+
+        seconds, _ = _timed(lambda: [db.insert_expense("July 2025", "Fuel", 250, "") for _ in range(single_inserts)])
+        record(rows, f"single insert_expense x{single_inserts}", seconds, per_op_us=seconds / single_inserts * 1e6)
+
+        if rows <= max_full_read:
+            seconds, df = _timed(db.get_all_expenses)
+            record(rows, "get_all_expenses", seconds, bytes=int(df.memory_usage(deep=True).sum()))
+            del df
+
+        record(rows, "get_monthly_totals", _timed(db.get_monthly_totals)[0])
+        seconds, label_totals = _timed(db.get_label_totals)
+        record(rows, "get_label_totals", seconds, result_rows=len(label_totals))
+        record(rows, "get_group_totals", _timed(db.get_group_totals)[0])
+        seconds, _ = _timed(lambda: aggregation.group_matrix(aggregation.label_matrix(label_totals)))
+        record(rows, "summary/trend matrices", seconds)
+        latest = db.format_period(LAST_PERIOD)
+        record(rows, "get_expense_page (first page)", _timed(lambda: db.get_expense_page(latest))[0])
+        record(rows, "rebuild_monthly_totals", _timed(db.rebuild_monthly_totals)[0])
+
+        if run_app:
+            profiles = _app_rerun_profile(tmpdir)
+            if profiles is None:
+                print("  (streamlit not installed; skipping headless app reruns)")
+            else:
+                for kind, run in zip(("cold", "warm"), profiles):
+                    record(rows, f"app rerun ({kind})", run["total_ms"] / 1000,
+                           db_ms=run["db_ms"], payload_bytes=run["payload_bytes"])
+                    for section in run["sections"]:
+                        record(rows, f"  {kind}: {section['section']}", section["ms"] / 1000)
+        db.close_all()
+
+    report = {
+        "commit": _git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "months": months,
+        "seed": seed,
+        "results": results,
+    }
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {out}")
+    return report
+
+
+def compare(before_path, after_path):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+    old = {(r["rows"], r["name"]): r["seconds"] for r in before["results"]}
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'rows':>12}  {'benchmark':<34} {'before':>12} {'after':>12} {'change':>8}")
+    for r in after["results"]:
+        key = (r["rows"], r["name"])
+        if key not in old:
+            continue
+        ratio = r["seconds"] / old[key] if old[key] else float("inf")
+        print(f"{r['rows']:>12,}  {r['name']:<34} {old[key] * 1000:>10.2f}ms {r['seconds'] * 1000:>10.2f}ms "
+              f"{ratio:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly spend tracker benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("concurrency", help="insert/read throughput with N concurrent sessions")
+    p.add_argument("--sessions", type=int, default=8)
+    p.add_argument("--ops", type=int, default=500)
+
+    p = sub.add_parser("writes", help="stress test: direct commits vs the background writer")
+    p.add_argument("--sessions", type=int, nargs="+", default=[4, 16, 64])
+    p.add_argument("--ops", type=int, default=200, help="inserts per session")
+    p.add_argument("--hold-ms", type=float, default=0,
+                   help="also hold the write lock from a second connection this long, on and off")
+
+    p = sub.add_parser("tenants", help="one household's read latency next to a much larger one")
+    p.add_argument("--small", type=int, default=5_000)
+    p.add_argument("--large", type=int, default=1_000_000)
+    p.add_argument("--months", type=int, default=36)
+
+    p = sub.add_parser("import", help="bulk CSV import throughput in rows/sec")
+    p.add_argument("--rows", type=int, default=200_000)
+    p.add_argument("--chunk-size", type=int, default=importer.DEFAULT_CHUNK_SIZE)
+
+    p = sub.add_parser("groups", help="category-group totals: isin masks vs single-pass pivot")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    p = sub.add_parser("export", help="peak memory of in-memory vs streamed exports")
+    p.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000])
+
+    p = sub.add_parser("memory", help="bytes per row of full ledger reads, before and after compaction")
+    p.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    p.add_argument("--months", type=int, default=120)
+
+    p = sub.add_parser("ranges", help="date-range analytics latency by span length")
+    p.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    p.add_argument("--months", type=int, default=120)
+    p.add_argument("--spans", type=int, nargs="+", default=[1, 12, 36, 120])
+
+    p = sub.add_parser("deltas", help="dashboard matrices after an edit: full recompute vs change-log delta")
+    p.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    p.add_argument("--months", type=int, default=120)
+    p.add_argument("--edits", type=int, default=50)
+
+    p = sub.add_parser("startup", help="time to first paint of a cold app.py process, default vs fast start")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    p.add_argument("--months", type=int, default=36)
+    p.add_argument("--repeat", type=int, default=3, help="fresh processes per mode; the best is reported")
+
+    p = sub.add_parser("suite", help="full synthetic-ledger suite with JSON results")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--months", type=int, default=120)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--single-inserts", type=int, default=500)
+    p.add_argument("--max-full-read", type=int, default=1_000_000,
+                   help="skip get_all_expenses above this many rows")
+    p.add_argument("--no-app", action="store_true", help="skip the headless app.py reruns")
+    p.add_argument("--out", help="write machine-readable results to this JSON file")
+
+    p = sub.add_parser("compare", help="compare two suite result files")
+    p.add_argument("before")
+    p.add_argument("after")
+
+    args = parser.parse_args(argv)
+    if args.command == "concurrency":
+        bench_concurrency(args.sessions, args.ops)
+    elif args.command == "writes":
+        bench_writes(args.sessions, args.ops, args.hold_ms)
+    elif args.command == "tenants":
+        bench_tenants(args.small, args.large, args.months)
+    elif args.command == "import":
+        bench_import(args.rows, args.chunk_size)
+    elif args.command == "groups":
+        bench_groups(args.rows)
+    elif args.command == "export":
+        bench_export(args.rows)
+    elif args.command == "memory":
+        bench_memory(args.rows, args.months)
+    elif args.command == "ranges":
+        bench_ranges(args.rows, args.months, args.spans)
+    elif args.command == "deltas":
+        bench_deltas(args.rows, args.months, args.edits)
+    elif args.command == "startup":
+        bench_startup(args.rows, args.months, args.repeat)
+    elif args.command == "suite":
+        bench_suite(args.rows, args.months, args.seed, args.single_inserts, args.max_full_read,
+                    not args.no_app, args.out)
+    elif args.command == "compare":
+        compare(args.before, args.after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# cache.py
+# Process-wide read cache shared by all Streamlit sessions. Entries are keyed
+# by the session's ledger file and that ledger's data version, which the expenses triggers bump on every
+# insert, update or delete, so any write invalidates them and unrelated
+# reruns are served from memory.
+#
+# Cached values are shared between sessions: callers must not mutate them.
+#
+# A function cached with a delta updater is not recomputed after single-entry
+# writes: its stale value is brought up to date from the rows the change log
+# says were written since (see db.get_changes).
+#
+# A value is only stored when the data version is the same after computing it
+# as before, so every entry holds exactly the data of the version it is
+# tagged with.
+import functools
+import threading
+from collections import OrderedDict
+
+import db
+
+MAX_ENTRIES = 512
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_stats = {}
+
+
+def _record(name, outcome):
+    counters = _stats.setdefault(name, {"hits": 0, "misses": 0, "deltas": 0})
+    counters[outcome] += 1
+
+
+def cached(fn=None, *, delta=None):
+    # delta(value, changes) -> updated value, or None to recompute instead
+    if fn is None:
+        return functools.partial(cached, delta=delta)
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        version = db.get_data_version()
+        key = (db.current_ledger(), name, args, tuple(sorted(kwargs.items())))
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and entry[0] == version:
+                _entries.move_to_end(key)
+                _record(name, "hits")
+                return entry[1]
+        value = None
+        if delta is not None and entry is not None and entry[0] < version:
+            changes = db.get_changes(entry[0], version)
+            if changes is not None:
+                value = delta(entry[1], changes)
+        with _lock:
+            _record(name, "misses" if value is None else "deltas")
+        if value is None:
+            value = fn(*args, **kwargs)
+        # A write committed while computing may or may not be in the value;
+        # storing it under the old version would make the next delta apply
+        # that write twice, so it is returned uncached instead
+        if db.get_data_version() != version:
+            return value
+        with _lock:
+            _entries[key] = (version, value)
+            _entries.move_to_end(key)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+        return value
+
+    return wrapper
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats():
+    # Per-function and overall hit/miss counters since process start
+    with _lock:
+        rows = [{"function": name, **counters} for name, counters in sorted(_stats.items())]
+        size = len(_entries)
+    hits = sum(r["hits"] for r in rows)
+    misses = sum(r["misses"] for r in rows)
+    deltas = sum(r["deltas"] for r in rows)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "deltas": deltas,
+        "hit_rate": hits / (hits + misses + deltas) if hits + misses + deltas else 0.0,
+        "entries": size,
+        "functions": rows,
+    }
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+# Cached versions of the db.py reads used by the dashboard
+get_expense_page = cached(db.get_expense_page)
+get_monthly_totals = cached(db.get_monthly_totals)
+get_period_totals = cached(db.get_period_totals)
+get_label_totals = cached(db.get_label_totals)
+get_group_totals = cached(db.get_group_totals)
+get_period_bounds = cached(db.get_period_bounds)
+get_range_analytics = cached(db.get_range_analytics)
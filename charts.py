@@ -0,0 +1,160 @@
+# charts.py
+# Vega-Lite specs for the dashboard charts. Each chart reads a named
+# dataset, so its spec depends only on the shape of the input frame and the
+# theme; the validated, serialized spec is memoized by a hash of both and
+# reruns with unchanged data skip Altair's build and validation entirely.
+# The frame itself is attached under the dataset name and sent once, as
+# Arrow, by st.vega_lite_chart.
+#
+# Returned specs are fresh dicts and may be handed straight to Streamlit.
+# Altair is only imported to build a spec, so cache hits never load it.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from dashboard import GREEN, RED, NEUTRAL
+
+MAX_SPECS = 64
+
+THEME = {
+    "background": "#1C3948",
+    "panel": "#22384a",
+    "accent": NEUTRAL,
+    "decrease": GREEN,
+    "increase": RED,
+    "axis": {
+        "domainColor": "white",
+        "tickColor": "white",
+        "labelColor": "white",
+        "titleColor": "white",
+    },
+    "grid": {"gridColor": "white", "gridOpacity": 0.3},
+}
+
+_lock = threading.Lock()
+_specs = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _axis(grid=True, **extra):
+    import altair as alt
+
+    return alt.Axis(**THEME["axis"], **(THEME["grid"] if grid else {}), **extra)
+
+
+def _fingerprint(kind, frame, params):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([kind, params, THEME, list(frame.columns)], sort_keys=True).encode())
+    digest.update(pd.util.hash_pandas_object(frame).values.tobytes())
+    return digest.hexdigest()
+
+
+def _spec(kind, build, frame, *params):
+    key = _fingerprint(kind, frame, params)
+    name = f"{kind}-{key}"
+    with _lock:
+        spec_json = _specs.get(key)
+        if spec_json is not None:
+            _specs.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+    if spec_json is None:
+        import altair as alt
+
+        spec = build(alt.NamedData(name=name), *params).to_dict()
+        # Altair's default theme only adds view sizes, which Streamlit overrides
+        spec.pop("config", None)
+        spec_json = json.dumps(spec)
+        with _lock:
+            _specs[key] = spec_json
+            while len(_specs) > MAX_SPECS:
+                _specs.popitem(last=False)
+    spec = json.loads(spec_json)
+    spec["datasets"] = {name: frame}
+    return spec
+
+
+def _donut(data, field):
+    import altair as alt
+
+    return alt.Chart(data).mark_arc(innerRadius=90, stroke='white', strokeWidth=3).encode(
+        theta=alt.Theta(field="Total", type="quantitative"),
+        color=alt.Color(field=field, type="nominal"),
+        tooltip=[f"{field}:N", "Total:Q"]
+    ).properties(
+        width=300,
+        height=300,
+        background=THEME["background"]
+    )
+
+
+def _trend(data, color_field):
+    import altair as alt
+
+    # Main multi-line chart
+    lines = alt.Chart().mark_line(point=True, strokeWidth=3).encode(
+        x=alt.X('Month:N', sort=None, axis=_axis(labelAngle=-45)),
+        y=alt.Y('Total:Q', axis=_axis()),
+        color=alt.Color(f'{color_field}:N'),
+        tooltip=['Month:N', f'{color_field}:N', 'Total:Q']
+    )
+    # Vertical rules at each month, from the distinct months of the same data
+    vlines = alt.Chart().mark_rule(
+        color='white',
+        strokeDash=[4,2],
+        size=2,
+        opacity=0.4
+    ).encode(
+        x=alt.X('Month:N', sort=None)
+    ).transform_aggregate(groupby=["Month"])
+    return alt.layer(lines, vlines, data=data).properties(
+        width='container',
+        height=400,
+        background=THEME["background"]
+    )
+
+
+def _change_bars(data):
+    import altair as alt
+
+    # Bar plot: green for decrease, red for increase
+    return alt.Chart(data).mark_bar(size=35, cornerRadiusTopLeft=8, cornerRadiusTopRight=8).encode(
+        x=alt.X('Label:N', sort=None, axis=_axis(grid=False)),
+        y=alt.Y('Change:Q', axis=_axis(grid=False)),
+        color={"condition": [{"test": "datum.Change < 0", "value": THEME["decrease"]},
+                             {"test": "datum.Change > 0", "value": THEME["increase"]}],
+               "value": THEME["accent"]},
+        tooltip=['Label:N', 'Change:Q']
+    ).properties(
+        width=300,
+        height=220,
+        background=THEME["panel"],
+        title=alt.TitleParams(text="Change by Category", color=THEME["accent"], fontSize=18, anchor="middle")
+    )
+
+
+def donut(frame, field):
+    # frame: <field> / Total
+    return _spec("donut", _donut, frame[[field, "Total"]], field)
+
+def trend(frame, color_field):
+    # frame: long-form Month / <color_field> / Total
+    return _spec("trend", _trend, frame[["Month", color_field, "Total"]], color_field)
+
+def change_bars(frame):
+    # frame: Label / Change
+    return _spec("change", _change_bars, frame[["Label", "Change"]])
+
+
+def clear():
+    with _lock:
+        _specs.clear()
+
+
+def stats():
+    with _lock:
+        return {**_stats, "entries": len(_specs)}
@@ -0,0 +1,185 @@
+# dashboard.py
+# Pure computation behind app.py. Every figure, table and chart frame on the
+# page is derived here from the shared period x label / period x group
+# matrices, with no Streamlit calls, so it can be imported, tested and
+# benchmarked without a browser.
+#
+# The headline comes from its own small query and needs no pandas; the
+# tables import it when first built, after the headline has been sent.
+import aggregation
+import db
+from aggregation import CATEGORY_GROUPS, ESSENTIAL_GROUPS
+from cache import cached, get_label_totals, get_period_totals
+from db import format_period, shift_period, ROLLING_WINDOWS
+
+GREEN = "#4CAF50"
+RED = "#FF5252"
+NEUTRAL = "#E68C3A"
+
+
+def _matrices_delta(value, changes):
+    # Applies each changed row's amount to its (period, label) cell and group.
+    # Integer amounts keep the truncated totals exact; anything else, or a
+    # label appearing or disappearing, recomputes instead.
+    labels, groups = value
+    diffs = {}
+    for before, after in changes:
+        for image, sign in ((before, -1), (after, 1)):
+            if image is None or image["period"] is None or image["label_id"] is None:
+                continue
+            if image["amount"] is None or image["amount"] != int(image["amount"]):
+                return None
+            key = (image["period"], image["label"])
+            diffs[key] = diffs.get(key, 0) + sign * int(image["amount"])
+    if any(label not in labels.columns for _, label in diffs):
+        return None
+    periods = {period for period, _ in diffs}
+    if not periods:
+        return value
+    index = sorted(set(labels.index) | periods)
+    labels = labels.reindex(index, fill_value=0).rename_axis(labels.index.name)
+    groups = groups.reindex(index, fill_value=0).rename_axis(groups.index.name)
+    for (period, label), diff in diffs.items():
+        labels.at[period, label] += diff
+        if label in aggregation.LABEL_TO_GROUP:
+            groups.at[period, aggregation.LABEL_TO_GROUP[label]] += diff
+    gone = periods - set(db.get_periods_with_entries(periods))
+    if gone:
+        labels, groups = labels.drop(index=list(gone)), groups.drop(index=list(gone))
+    if labels.empty or not labels.any().all():
+        return None
+    return labels, groups
+
+
+# Period x label and period x group totals shared by every section, built in
+# one pass over the monthly rollup and kept current from the change log
+@cached(delta=_matrices_delta)
+def matrices():
+    labels = aggregation.label_matrix(get_label_totals())
+    groups = aggregation.group_matrix(labels)
+    return labels.astype(int), groups.astype(int)
+
+
+def headline(period):
+    # This month's total, last month's total and the colour comparing them,
+    # or None when the month has no entries
+    prev_period = shift_period(period, -1)
+    totals = get_period_totals((period, prev_period))
+    if period not in totals:
+        return None
+    total = int(totals[period])
+    prev_total = int(totals.get(prev_period, 0))
+    if total < prev_total:
+        color = GREEN
+    elif total > prev_total:
+        color = RED
+    else:
+        color = "#fff"
+    return {"total": total, "prev_total": prev_total, "color": color}
+
+
+def summary_table(group_totals):
+    import pandas as pd
+
+    summary_df = pd.DataFrame({
+        "Category": list(CATEGORY_GROUPS),
+        "Total": [int(group_totals[group]) for group in CATEGORY_GROUPS]
+    })
+    summary_df = pd.concat([
+        summary_df,
+        pd.DataFrame({"Category": ["Total"], "Total": [summary_df["Total"].sum()]})
+    ], ignore_index=True)
+    summary_df.index += 1
+    return summary_df
+
+
+def label_table(label_totals):
+    # Labels with spending this month
+    table = label_totals[label_totals != 0].rename_axis("Label").reset_index(name="Total")
+    table.index += 1
+    return table
+
+
+def essentials_table(group_totals):
+    import pandas as pd
+
+    table = pd.DataFrame({
+        "Category": ["Essentials Total", "Non-Essentials Total"],
+        "Total": [int(group_totals[ESSENTIAL_GROUPS].sum()), int(group_totals.drop(ESSENTIAL_GROUPS).sum())]
+    })
+    table.index += 1
+    return table
+
+
+def group_trend(groups):
+    # Long-form Month / Category / Total rows for the month to month chart
+    wide = groups.rename(index=format_period).rename_axis("Month").reset_index()
+    return wide.melt(id_vars=["Month"], value_vars=list(CATEGORY_GROUPS), var_name="Category", value_name="Total")
+
+
+def label_trend(labels):
+    # Long-form Month / Label / Total rows for the category trend chart
+    return (
+        labels.rename(index=format_period)
+        .rename_axis(index="Month", columns="Label")
+        .stack()
+        .rename("Total")
+        .reset_index()
+    )
+
+
+def month_change(labels):
+    # Per-label change between the two latest months, or None with fewer than two
+    if len(labels) < 2:
+        return None
+    change = labels.iloc[-1] - labels.iloc[-2]
+    change_df = change.rename_axis("Label").reset_index(name="Change")
+    return {
+        "decreased": [(label, -int(diff)) for label, diff in change.items() if diff < 0],
+        "increased": [(label, int(diff)) for label, diff in change.items() if diff > 0],
+        "frame": change_df,
+    }
+
+
+# Range analytics columns offered on the date range chart
+RANGE_METRICS = {
+    "Monthly total": "total",
+    **{f"{n}-month average": f"avg_{n}m" for n in ROLLING_WINDOWS},
+    "Running total": "running_total",
+    "Year over year %": "yoy_change",
+}
+
+
+def range_summary(frame):
+    # Per-group figures for a db.get_range_analytics() frame: range total,
+    # monthly average, and the rolling averages and year-over-year change as
+    # of the last month, with a Total row
+    import pandas as pd
+
+    latest = frame[frame["period"] == frame["period"].max()].set_index("category")
+    by_group = frame.groupby("category", sort=False)["total"]
+    table = pd.DataFrame({
+        "Total": by_group.sum(),
+        "Monthly Avg": by_group.mean(),
+        **{f"{n}-Mo Avg": latest[f"avg_{n}m"] for n in ROLLING_WINDOWS},
+        "Last Month": latest["total"],
+        "Year Earlier": latest["last_year"],
+    })
+    table.loc["Total"] = table.sum(min_count=1)
+    table["YoY %"] = ((table["Last Month"] - table["Year Earlier"]) / table["Year Earlier"].where(table["Year Earlier"] != 0) * 100).round(1)
+    table = table.rename_axis("Category").reset_index()
+    amounts = table.columns[1:-1]
+    table[amounts] = table[amounts].round().astype("Int64")
+    table.index += 1
+    return table
+
+
+def range_trend(frame, column):
+    # Long-form Month / Category / Total rows of one range metric
+    trend = frame[["date_str", "category", column]].rename(
+        columns={"date_str": "Month", "category": "Category", column: "Total"})
+    if column == "yoy_change":
+        trend["Total"] = (trend["Total"].astype(float) * 100).round(1)
+    else:
+        trend["Total"] = trend["Total"].round()
+    return trend
@@ -1,43 +1,933 @@
-# db.py
-import sqlite3
-import pandas as pd
-
-DB_NAME = "expenses.db"
-
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS expenses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date_str TEXT,
-            label TEXT,
-            amount REAL,
-            comment TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def insert_expense(date_str, label, amount, comment):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO expenses (date_str, label, amount, comment) VALUES (?, ?, ?, ?)",
-                (date_str, label, amount, comment))
-    conn.commit()
-    conn.close()
-
-def delete_last_expense():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM expenses WHERE id = (SELECT MAX(id) FROM expenses)")
-    conn.commit()
-    conn.close()
-
-def get_all_expenses():
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("SELECT * FROM expenses ORDER BY timestamp DESC", conn)
-    conn.close()
-    return df
-
+# db.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+import queue
+from contextlib import contextmanager
+
+import profiling
+from aggregation import CATEGORY_GROUPS
+
+DB_NAME = "expenses.db"
+
+# Each tenant (household) gets its own file under LEDGER_DIR, so its queries
+# only ever touch its own data; the unnamed default ledger is DB_NAME. Tenant
+# ledgers are created explicitly (manage.py ledgers create), never on first use
+LEDGER_DIR = "ledgers"
+LEDGER_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+# A ledger's pool is closed after this long without a read or write; the next
+# use reopens it
+POOL_IDLE_SECONDS = 600
+
+# Labels offered by the sidebar form, in display order
+LABELS = ["Dining", "Chicken", "Lovely", "House", "Fuel", "EMI", "Non-Essentials"]
+
+# Connection tuning shared by the writer and the read-only pool
+READER_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+PRAGMAS = {
+    "synchronous": "NORMAL",   # safe with WAL, avoids an fsync per commit
+    "cache_size": -16000,      # ~16 MB page cache per connection
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    # One long-lived writer plus a small pool of read-only readers for a
+    # single database file. Shared by every Streamlit session in the process.
+
+    def __init__(self, path, readers=READER_POOL_SIZE):
+        self.path = path
+        self.size = readers
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._readers = queue.Queue()
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def _configure(self, conn):
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _open_writer(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return self._configure(conn)
+
+    def _open_reader(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        return self._configure(conn)
+
+    @contextmanager
+    def writer(self):
+        # Serializes writers in-process; the caller's block runs in a transaction.
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    @contextmanager
+    def reader(self):
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._create_lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                # The writer creates the file and switches it to WAL first
+                if self._writer is None:
+                    with self._write_lock:
+                        if self._writer is None:
+                            self._writer = self._open_writer()
+                conn = self._open_reader()
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def dedicated_reader(self):
+        # A read-only connection of its own for long reads such as exports,
+        # which would otherwise hold a pooled reader the dashboard needs
+        conn = self._open_reader()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def idle(self):
+        # No write in progress and every reader handed back
+        return not self._write_lock.locked() and self._readers.qsize() == self._created
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_next_sweep = 0.0
+
+# The ledger selected by the session running on this thread
+_session = threading.local()
+
+
+def ledger_path(ledger=None):
+    if not ledger:
+        return DB_NAME
+    if not LEDGER_NAME.fullmatch(ledger):
+        raise ValueError(f"Invalid ledger name {ledger!r}; use letters, digits, '-' or '_'")
+    return os.path.join(LEDGER_DIR, f"{ledger}.db")
+
+
+def use_ledger(ledger=None, create=False):
+    # Points this thread's reads and writes at a tenant's ledger file; a
+    # tenant ledger must already exist unless create is set
+    path = ledger_path(ledger)
+    if path != DB_NAME and not os.path.exists(path):
+        if not create:
+            raise ValueError(f"No ledger named {ledger!r}; create it with: python manage.py ledgers create {ledger}")
+        os.makedirs(LEDGER_DIR, exist_ok=True)
+    _session.path = path
+    return path
+
+
+def list_ledgers():
+    # Names of the tenant ledgers under LEDGER_DIR
+    if not os.path.isdir(LEDGER_DIR):
+        return []
+    names = (f[:-3] for f in os.listdir(LEDGER_DIR) if f.endswith(".db"))
+    return sorted(name for name in names if LEDGER_NAME.fullmatch(name))
+
+
+def current_ledger():
+    return getattr(_session, "path", None) or DB_NAME
+
+
+def get_pool(path=None):
+    path = path or current_ledger()
+    now = time.monotonic()
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        pool.last_used = now
+        _close_idle_pools(now)
+        return pool
+
+
+def _close_idle_pools(now):
+    # Called with _pools_lock held; looks at most ten times per idle period
+    global _next_sweep
+    if now < _next_sweep:
+        return
+    _next_sweep = now + POOL_IDLE_SECONDS / 10
+    for path, pool in list(_pools.items()):
+        if now - pool.last_used > POOL_IDLE_SECONDS and pool.idle():
+            pool.close()
+            del _pools[path]
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _initialized.clear()
+
+
+# ---- Periods ----
+# The UI works with "July 2025" strings; the table stores an ISO "2025-07"
+# period key next to it so ordering and range queries use the index.
+
+@lru_cache(maxsize=1024)
+def parse_period(date_str):
+    try:
+        return datetime.strptime(date_str.strip(), "%B %Y").strftime("%Y-%m")
+    except (AttributeError, ValueError):
+        return None
+
+@lru_cache(maxsize=1024)
+def format_period(period):
+    return datetime.strptime(period, "%Y-%m").strftime("%B %Y")
+
+# Months counted from year 0, so consecutive months are consecutive integers
+def period_index(period):
+    year, month = map(int, period.split("-"))
+    return year * 12 + month - 1
+
+def index_period(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def shift_period(period, months):
+    return index_period(period_index(period) + months)
+
+def _period_index_sql(column):
+    # period_index() of a period column, in SQL
+    return f"(CAST(substr({column}, 1, 4) AS INTEGER) * 12 + CAST(substr({column}, 6, 2) AS INTEGER) - 1)"
+
+
+# ---- Schema ----
+
+def _migrate_base(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_str TEXT,
+            label TEXT,
+            amount REAL,
+            comment TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _migrate_normalize(conn):
+    # ISO period key + integer label id, backfilled from the text columns
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS labels (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(expenses)")}
+    if "period" not in columns:
+        conn.execute("ALTER TABLE expenses ADD COLUMN period TEXT")
+    if "label_id" not in columns:
+        conn.execute("ALTER TABLE expenses ADD COLUMN label_id INTEGER REFERENCES labels (id)")
+
+    conn.executemany("INSERT OR IGNORE INTO labels (name) VALUES (?)", [(l,) for l in LABELS])
+    conn.execute("""
+        INSERT OR IGNORE INTO labels (name)
+        SELECT DISTINCT label FROM expenses WHERE label IS NOT NULL
+    """)
+    conn.execute("UPDATE expenses SET label_id = (SELECT id FROM labels WHERE name = expenses.label)")
+    date_strs = [row[0] for row in conn.execute("SELECT DISTINCT date_str FROM expenses")]
+    conn.executemany("UPDATE expenses SET period = ? WHERE date_str = ?",
+                     [(parse_period(d), d) for d in date_strs])
+
+    conn.execute("DROP INDEX IF EXISTS idx_expenses_date_label")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_period_label ON expenses (period, label_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_label_period ON expenses (label_id, period)")
+
+_ROLLUP_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_insert
+    AFTER INSERT ON expenses WHEN NEW.period IS NOT NULL AND NEW.label_id IS NOT NULL
+    BEGIN
+        INSERT INTO monthly_totals (period, label_id, total, entries)
+        VALUES (NEW.period, NEW.label_id, NEW.amount, 1)
+        ON CONFLICT (period, label_id) DO UPDATE
+        SET total = total + excluded.total, entries = entries + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_delete
+    AFTER DELETE ON expenses WHEN OLD.period IS NOT NULL AND OLD.label_id IS NOT NULL
+    BEGIN
+        UPDATE monthly_totals SET total = total - OLD.amount, entries = entries - 1
+        WHERE period = OLD.period AND label_id = OLD.label_id;
+        DELETE FROM monthly_totals
+        WHERE period = OLD.period AND label_id = OLD.label_id AND entries <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_expenses_rollup_update
+    AFTER UPDATE OF period, label_id, amount ON expenses
+    BEGIN
+        UPDATE monthly_totals SET total = total - OLD.amount, entries = entries - 1
+        WHERE period = OLD.period AND label_id = OLD.label_id;
+        DELETE FROM monthly_totals
+        WHERE period = OLD.period AND label_id = OLD.label_id AND entries <= 0;
+        INSERT INTO monthly_totals (period, label_id, total, entries)
+        SELECT NEW.period, NEW.label_id, NEW.amount, 1
+        WHERE NEW.period IS NOT NULL AND NEW.label_id IS NOT NULL
+        ON CONFLICT (period, label_id) DO UPDATE
+        SET total = total + excluded.total, entries = entries + 1;
+    END;
+"""
+
+_ROLLUP_SOURCE = """
+    SELECT period, label_id, SUM(amount) AS total, COUNT(*) AS entries
+    FROM expenses WHERE period IS NOT NULL AND label_id IS NOT NULL
+    GROUP BY period, label_id
+"""
+
+def _migrate_rollup(conn):
+    # Materialized (period, label) totals kept in step with expenses by triggers,
+    # so the dashboard reads a few hundred rows instead of the ledger
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS monthly_totals (
+            period TEXT NOT NULL,
+            label_id INTEGER NOT NULL REFERENCES labels (id),
+            total REAL NOT NULL,
+            entries INTEGER NOT NULL,
+            PRIMARY KEY (period, label_id)
+        ) WITHOUT ROWID
+    """)
+    for statement in _ROLLUP_TRIGGERS.split("END;")[:-1]:
+        conn.execute(statement + "END;")
+    conn.execute("DELETE FROM monthly_totals")
+    conn.execute(f"INSERT INTO monthly_totals (period, label_id, total, entries) {_ROLLUP_SOURCE}")
+
+def _migrate_data_version(conn):
+    # Counter bumped by every write to expenses; caches key on it so a write
+    # from any session or process invalidates them
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+    for event in ("INSERT", "DELETE", "UPDATE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_expenses_version_{event.lower()}
+            AFTER {event} ON expenses
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'data_version';
+            END
+        """)
+
+def _migrate_page_indexes(conn):
+    # Serve each sort order of the paged entries view straight off an index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_period_timestamp ON expenses (period, timestamp, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_period_amount ON expenses (period, amount, id)")
+
+def _migrate_user(conn):
+    # Who added each entry, so "delete last" only removes the caller's own
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(expenses)")}
+    if "user" not in columns:
+        conn.execute("ALTER TABLE expenses ADD COLUMN user TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_user ON expenses (user, id)")
+
+def _migrate_events(conn):
+    # Append-only log of single-entry changes, each with the full row before
+    # and after as JSON and the data_version it produced
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS expense_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            expense_id INTEGER NOT NULL,
+            user TEXT,
+            target INTEGER,
+            before TEXT,
+            after TEXT,
+            version INTEGER NOT NULL,
+            created DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expense_events_user ON expense_events (user, seq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expense_events_version ON expense_events (version)")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('events_compacted', 0)")
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_base,
+    _migrate_normalize,
+    _migrate_rollup,
+    _migrate_data_version,
+    _migrate_page_indexes,
+    _migrate_user,
+    _migrate_events,
+]
+
+# Ledger files already migrated by this process
+_initialized = set()
+
+@profiling.traced
+def init_db():
+    # Runs the pending migrations once per ledger per process; later reruns
+    # return without touching the database
+    path = current_ledger()
+    if path in _initialized:
+        return
+    with get_pool(path).writer() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+    _initialized.add(path)
+
+def _label_id(conn, label):
+    row = conn.execute("SELECT id FROM labels WHERE name = ?", (label,)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute("INSERT INTO labels (name) VALUES (?)", (label,)).lastrowid
+
+# ---- Change log ----
+# Every single-entry write (add, edit, delete, and the undo/redo of one) is
+# appended to expense_events in the transaction that makes it. The expenses
+# table stays the current snapshot; the log records how it got there, which
+# is enough to undo or redo a user's changes and to update derived data from
+# just the rows that changed. Bulk imports are not logged.
+
+# Events kept by compact_events(); older ones are folded into the snapshot
+EVENT_LOG_KEEP = 5000
+CHANGE_KINDS = ("insert", "edit", "delete")
+
+# Columns of a row image, and the same image built as JSON by SQLite
+EXPENSE_COLUMNS = ["id", "date_str", "period", "label", "label_id", "amount", "comment", "timestamp", "user"]
+_ROW_JSON = "json_object(" + ", ".join(f"'{c}', {c}" for c in EXPENSE_COLUMNS) + ")"
+
+def _row(conn, expense_id):
+    row = conn.execute(f"SELECT {', '.join(EXPENSE_COLUMNS)} FROM expenses WHERE id = ?", (expense_id,)).fetchone()
+    return None if row is None else dict(zip(EXPENSE_COLUMNS, row))
+
+def _log_event(conn, kind, expense_id, user, before, after, target=None):
+    conn.execute("INSERT INTO expense_events (kind, expense_id, user, target, before, after, version) "
+                 "VALUES (?, ?, ?, ?, ?, ?, (SELECT value FROM meta WHERE key = 'data_version'))",
+                 (kind, expense_id, user, target,
+                  None if before is None else json.dumps(before), None if after is None else json.dumps(after)))
+
+def _apply_row(conn, expense_id, before, after):
+    # Moves an entry from its `before` image to its `after` one (None meaning
+    # absent), provided nothing else has changed it in the meantime
+    if _row(conn, expense_id) != before:
+        raise ValueError(f"Entry #{expense_id} has changed since; the change can no longer be reverted.")
+    if after is None:
+        conn.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+    elif before is None:
+        conn.execute(f"INSERT INTO expenses ({', '.join(after)}) VALUES ({', '.join('?' * len(after))})",
+                     list(after.values()))
+    else:
+        changed = [column for column in after if after[column] != before.get(column)]
+        if changed:
+            conn.execute(f"UPDATE expenses SET {', '.join(f'{c} = ?' for c in changed)} WHERE id = ?",
+                         [after[c] for c in changed] + [expense_id])
+
+# Single-row writes on an open transaction; also applied in batches by writer.py
+def _insert_expense(conn, date_str, label, amount, comment, user=None):
+    expense_id = conn.execute("INSERT INTO expenses (date_str, period, label, label_id, amount, comment, user) "
+                              "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (date_str, parse_period(date_str), label, _label_id(conn, label), amount, comment,
+                               user)).lastrowid
+    # The hot path: the row image is built in SQL rather than read back
+    conn.execute(f"INSERT INTO expense_events (kind, expense_id, user, after, version) "
+                 f"SELECT 'insert', id, user, {_ROW_JSON}, (SELECT value FROM meta WHERE key = 'data_version') "
+                 f"FROM expenses WHERE id = ?", (expense_id,))
+    return expense_id
+
+def _edit_expense(conn, expense_id, label, amount, comment, user=None):
+    # New label, amount and comment for an entry; returns 1 if it exists, else 0
+    before = _row(conn, expense_id)
+    if before is None:
+        return 0
+    after = {**before, "label": label, "label_id": _label_id(conn, label), "amount": amount, "comment": comment}
+    if after != before:
+        _apply_row(conn, expense_id, before, after)
+        _log_event(conn, "edit", expense_id, user, before, _row(conn, expense_id))
+    return 1
+
+def _delete_expense(conn, expense_id, user=None):
+    before = _row(conn, expense_id)
+    if before is None:
+        return 0
+    _apply_row(conn, expense_id, before, None)
+    _log_event(conn, "delete", expense_id, user, before, None)
+    return 1
+
+def _delete_last_expense(conn, user=None):
+    # The newest entry added by user; None only reaches untagged entries
+    row = conn.execute("SELECT MAX(id) FROM expenses WHERE user IS ?", (user,)).fetchone()
+    return 0 if row[0] is None else _delete_expense(conn, row[0], user)
+
+def _history(conn, user):
+    # The user's undo and redo stacks (event seqs, most recent last), replayed
+    # from their part of the log. A new change clears the redo stack.
+    done, undone = [], []
+    for seq, kind, target in conn.execute(
+            "SELECT seq, kind, target FROM expense_events WHERE user IS ? ORDER BY seq", (user,)):
+        if kind in CHANGE_KINDS:
+            done.append(seq)
+            undone.clear()
+        elif kind == "undo" and target in done:
+            done.remove(target)
+            undone.append(target)
+        elif kind == "redo" and target in undone:
+            undone.remove(target)
+            done.append(target)
+    return done, undone
+
+def _step(conn, user, undo):
+    done, undone = _history(conn, user)
+    stack = done if undo else undone
+    if not stack:
+        return None
+    seq = stack[-1]
+    kind, expense_id, before, after = conn.execute(
+        "SELECT kind, expense_id, before, after FROM expense_events WHERE seq = ?", (seq,)).fetchone()
+    before = None if before is None else json.loads(before)
+    after = None if after is None else json.loads(after)
+    if undo:
+        before, after = after, before
+    _apply_row(conn, expense_id, before, after)
+    _log_event(conn, "undo" if undo else "redo", expense_id, user, before, after, target=seq)
+    return {"kind": kind, "expense_id": expense_id}
+
+def _undo(conn, user=None):
+    # Reverts the user's most recent change still in effect; returns what was
+    # undone ({"kind", "expense_id"}) or None when there is nothing to undo
+    return _step(conn, user, undo=True)
+
+def _redo(conn, user=None):
+    # Re-applies the change the user most recently undid
+    return _step(conn, user, undo=False)
+
+def _compact_events(conn, keep=EVENT_LOG_KEEP):
+    # Folds all but the newest `keep` events into the snapshot; their changes
+    # can no longer be undone. Returns how many events were dropped.
+    cutoff = conn.execute("SELECT MAX(seq) FROM expense_events").fetchone()[0]
+    if cutoff is None or cutoff <= keep:
+        return 0
+    cutoff -= keep
+    dropped = conn.execute("DELETE FROM expense_events WHERE seq <= ?", (cutoff,)).rowcount
+    conn.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'events_compacted'", (cutoff,))
+    return dropped
+
+@profiling.traced
+def insert_expense(date_str, label, amount, comment, user=None):
+    with get_pool().writer() as conn:
+        return _insert_expense(conn, date_str, label, amount, comment, user)
+
+@profiling.traced
+def insert_expenses(rows, user=None):
+    # Bulk insert of (date_str, label, amount, comment) rows in one transaction
+    rows = list(rows)
+    with get_pool().writer() as conn:
+        label_ids = {label: _label_id(conn, label) for label in {row[1] for row in rows}}
+        conn.executemany("INSERT INTO expenses (date_str, period, label, label_id, amount, comment, user) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [(date_str, parse_period(date_str), label, label_ids[label], amount, comment, user)
+                          for date_str, label, amount, comment in rows])
+    return len(rows)
+
+# The rules the sidebar form enforces; returns an error message or None
+def validate_expense(date_str, label, amount, comment):
+    if parse_period(date_str) is None:
+        return f"Unrecognised month {date_str!r}, expected e.g. 'July 2025'."
+    if label not in LABELS:
+        return f"Unknown category {label!r}."
+    if amount is None or amount != amount or amount < 0:
+        return "Amount must be a number of zero or more."
+    if label == "Non-Essentials" and (comment or "").strip() == "":
+        return "Comment is required for Non-Essentials."
+    return None
+
+@profiling.traced
+def get_expense_counts(periods):
+    # {(period, label, amount, comment): count} for the given periods
+    periods = list(periods)
+    if not periods:
+        return {}
+    with get_pool().reader() as conn:
+        rows = conn.execute(f"""
+            SELECT period, label, amount, COALESCE(comment, ''), COUNT(*) FROM expenses
+            WHERE period IN ({', '.join('?' * len(periods))})
+            GROUP BY period, label, amount, COALESCE(comment, '')
+        """, periods).fetchall()
+    return {tuple(row[:4]): row[4] for row in rows}
+
+@profiling.traced
+def delete_last_expense(user=None):
+    with get_pool().writer() as conn:
+        return _delete_last_expense(conn, user)
+
+@profiling.traced
+def edit_expense(expense_id, label, amount, comment, user=None):
+    with get_pool().writer() as conn:
+        return _edit_expense(conn, expense_id, label, amount, comment, user)
+
+@profiling.traced
+def delete_expense(expense_id, user=None):
+    with get_pool().writer() as conn:
+        return _delete_expense(conn, expense_id, user)
+
+@profiling.traced
+def undo(user=None):
+    with get_pool().writer() as conn:
+        return _undo(conn, user)
+
+@profiling.traced
+def redo(user=None):
+    with get_pool().writer() as conn:
+        return _redo(conn, user)
+
+@profiling.traced
+def compact_events(keep=EVENT_LOG_KEEP, path=None):
+    with get_pool(path).writer() as conn:
+        return _compact_events(conn, keep)
+
+@profiling.traced
+def get_changes(since_version, version):
+    # (before, after) row images of every write between two data versions, or
+    # None when the log does not cover all of them (bulk imports, compacted
+    # events); callers then recompute from scratch
+    with get_pool().reader() as conn:
+        rows = conn.execute("SELECT before, after FROM expense_events WHERE version > ? AND version <= ? "
+                            "ORDER BY version", (since_version, version)).fetchall()
+    if len(rows) != version - since_version:
+        return None
+    return [tuple(None if image is None else json.loads(image) for image in row) for row in rows]
+
+@profiling.traced
+def get_event_stats():
+    with get_pool().reader() as conn:
+        events, first, last = conn.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM expense_events").fetchone()
+        compacted = conn.execute("SELECT value FROM meta WHERE key = 'events_compacted'").fetchone()[0]
+    return {"events": events, "first_seq": first, "last_seq": last, "compacted_through": compacted}
+
+# ---- Compact ledger frames ----
+# Full-history reads return only what analysis needs, in small dtypes:
+# categorical period and label, integer amount_paise, datetime64 timestamp.
+# Comments are text and most callers never look at them, so they are only
+# fetched on request. numpy and pandas are imported on first use, so the
+# schema, write and headline paths never load them.
+
+LEDGER_CHUNK_SIZE = 100_000
+_NAT = -2 ** 63  # datetime64's NaT
+
+_LEDGER_SQL = f"""
+    SELECT id,
+           COALESCE({_period_index_sql("period")}, -1),
+           COALESCE(label_id, -1),
+           COALESCE(CAST(ROUND(amount * 100) AS INTEGER), 0),
+           COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), {_NAT})
+    FROM expenses
+"""
+
+def _ledger_frame(conn):
+    # Integer columns only, fetched in chunks so no per-row Python objects
+    # outlive a chunk; newest first, sorted here rather than by SQLite
+    import numpy as np
+    import pandas as pd
+
+    cur = conn.execute(_LEDGER_SQL)
+    chunks = []
+    while True:
+        rows = cur.fetchmany(LEDGER_CHUNK_SIZE)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+    values = np.concatenate(chunks) if chunks else np.empty((0, 5), dtype=np.int64)
+    values = values[np.lexsort((values[:, 0], values[:, 4]))[::-1]]
+    ids, months, label_ids, paise, seconds = values.T
+
+    present, month_codes = np.unique(months, return_inverse=True)
+    if len(present) and present[0] == -1:
+        present, month_codes = present[1:], month_codes - 1
+    periods = [index_period(m) for m in present]
+
+    labels = conn.execute("SELECT id, name FROM labels ORDER BY id").fetchall()
+    label_codes = np.full(max([i for i, _ in labels] + [0]) + 2, -1, dtype=np.int64)
+    label_codes[[i for i, _ in labels]] = np.arange(len(labels))
+
+    return pd.DataFrame({
+        "id": ids,
+        "period": pd.Categorical.from_codes(month_codes, periods),
+        "label": pd.Categorical.from_codes(label_codes[label_ids], [name for _, name in labels]),
+        "amount_paise": paise,
+        "timestamp": seconds.astype("datetime64[s]"),
+    })
+
+@contextmanager
+def _snapshot(conn):
+    # Holds one read transaction so several SELECTs on a reader see the same
+    # version of the ledger, whatever commits in between
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+def _with_comments(conn, frame):
+    # One pass in rowid order, aligned to the frame's ids; conn must hold the
+    # snapshot the frame was read in (see _snapshot), so the ids match exactly
+    import numpy as np
+    import pandas as pd
+
+    rows = conn.execute("SELECT id, comment FROM expenses ORDER BY id").fetchall()
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    comments = pd.array([row[1] for row in rows], dtype="string")
+    frame["comment"] = comments[np.searchsorted(ids, frame["id"].to_numpy())] if len(rows) else comments
+    return frame
+
+@profiling.traced
+def get_all_expenses(comments=False):
+    with get_pool().reader() as conn, _snapshot(conn):
+        frame = _ledger_frame(conn)
+        return _with_comments(conn, frame) if comments else frame
+
+
+@profiling.traced
+def get_data_version():
+    with get_pool().reader() as conn:
+        return conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+
+
+# ---- Rollup maintenance ----
+
+# Largest difference between a rollup total and a fresh sum that counts as
+# agreement; the triggers add and subtract REAL amounts one at a time, so
+# decimal amounts pick up float rounding the fresh sum does not have
+ROLLUP_TOLERANCE = 1e-6
+
+@profiling.traced
+def verify_monthly_totals():
+    # Rows where the rollup disagrees with a fresh GROUP BY over expenses
+    return _read(f"""
+        SELECT s.period, s.label_id, s.total AS expected_total, s.entries AS expected_entries,
+               m.total AS rollup_total, m.entries AS rollup_entries
+        FROM ({_ROLLUP_SOURCE}) s
+        LEFT JOIN monthly_totals m ON m.period = s.period AND m.label_id = s.label_id
+        WHERE m.total IS NULL OR ABS(m.total - s.total) > ? OR m.entries IS NOT s.entries
+        UNION ALL
+        SELECT m.period, m.label_id, NULL, NULL, m.total, m.entries
+        FROM monthly_totals m
+        WHERE NOT EXISTS (SELECT 1 FROM expenses e WHERE e.period = m.period AND e.label_id = m.label_id)
+    """, [ROLLUP_TOLERANCE])
+
+@profiling.traced
+def rebuild_monthly_totals():
+    with get_pool().writer() as conn:
+        conn.execute("DELETE FROM monthly_totals")
+        conn.execute(f"INSERT INTO monthly_totals (period, label_id, total, entries) {_ROLLUP_SOURCE}")
+        return conn.execute("SELECT COUNT(*) FROM monthly_totals").fetchone()[0]
+
+
+# ---- Aggregate queries ----
+# Served from the monthly_totals rollup; results come back in calendar
+# order with the "July 2025" display string attached.
+
+def _group_case():
+    whens = []
+    params = []
+    for group, labels in CATEGORY_GROUPS.items():
+        whens.append(f"WHEN l.name IN ({', '.join('?' * len(labels))}) THEN ?")
+        params.extend(labels)
+        params.append(group)
+    return f"CASE {' '.join(whens)} END", params
+
+def _month_filter(date_str):
+    if date_str is None:
+        return "", []
+    return "WHERE m.period = ?", [parse_period(date_str)]
+
+def _read(sql, params=()):
+    import pandas as pd
+
+    with get_pool().reader() as conn:
+        return pd.read_sql_query(sql, conn, params=list(params))
+
+def _with_date_str(df):
+    df.insert(1, "date_str", [format_period(p) for p in df["period"]])
+    return df
+
+# Columns the entries view may sort by; id breaks ties so keys are unique
+PAGE_SORT_COLUMNS = ["timestamp", "amount", "label"]
+
+@profiling.traced
+def get_expense_page(date_str, label=None, sort="timestamp", descending=True, page_size=50, after=None):
+    # Keyset pagination over one month. `after` is the (sort value, id) of the
+    # last row on the previous page; the next page starts right after it.
+    if sort not in PAGE_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort entries by {sort!r}; expected one of {', '.join(PAGE_SORT_COLUMNS)}")
+    where = ["period = ?"]
+    params = [parse_period(date_str)]
+    if label:
+        where.append("label_id = (SELECT id FROM labels WHERE name = ?)")
+        params.append(label)
+    op, direction = ("<", "DESC") if descending else (">", "ASC")
+    if after is not None:
+        where.append(f"({sort}, id) {op} (?, ?)")
+        params.extend(after)
+    return _read(f"""
+        SELECT id, date_str, label,
+               CASE WHEN amount = CAST(amount AS INTEGER) THEN CAST(amount AS INTEGER) ELSE amount END AS amount,
+               comment, timestamp
+        FROM expenses
+        WHERE {' AND '.join(where)}
+        ORDER BY {sort} {direction}, id {direction}
+        LIMIT ?
+    """, params + [page_size])
+
+@profiling.traced
+def get_monthly_totals():
+    return _with_date_str(_read(
+        "SELECT period, SUM(total) AS total, SUM(entries) AS entries "
+        "FROM monthly_totals GROUP BY period ORDER BY period"))
+
+@profiling.traced
+def get_period_totals(periods):
+    # {period: total over the grouped labels} for just the given periods,
+    # straight off the rollup's primary key; periods without entries are left out
+    periods = list(periods)
+    labels = [label for group in CATEGORY_GROUPS.values() for label in group]
+    with get_pool().reader() as conn:
+        return dict(conn.execute(f"""
+            SELECT m.period, SUM(m.total)
+            FROM monthly_totals m JOIN labels l ON l.id = m.label_id
+            WHERE m.period IN ({', '.join('?' * len(periods))})
+              AND l.name IN ({', '.join('?' * len(labels))})
+            GROUP BY m.period
+        """, periods + labels).fetchall())
+
+@profiling.traced
+def get_periods_with_entries(periods):
+    # The given periods that still have rows in the rollup
+    periods = list(periods)
+    with get_pool().reader() as conn:
+        return [row[0] for row in conn.execute(
+            f"SELECT DISTINCT period FROM monthly_totals WHERE period IN ({', '.join('?' * len(periods))})",
+            periods)]
+
+@profiling.traced
+def get_label_totals(date_str=None):
+    where, params = _month_filter(date_str)
+    return _with_date_str(_read(f"""
+        SELECT m.period, l.name AS label, m.total
+        FROM monthly_totals m JOIN labels l ON l.id = m.label_id {where}
+        ORDER BY m.period, m.label_id
+    """, params))
+
+@profiling.traced
+def get_group_totals(date_str=None):
+    case, params = _group_case()
+    where, month_params = _month_filter(date_str)
+    return _with_date_str(_read(f"""
+        SELECT period, category, SUM(total) AS total FROM (
+            SELECT m.period, m.total, {case} AS category
+            FROM monthly_totals m JOIN labels l ON l.id = m.label_id {where}
+        ) WHERE category IS NOT NULL
+        GROUP BY period, category
+        ORDER BY period
+    """, params + month_params))
+
+@profiling.traced
+def get_period_bounds():
+    # (first, last) period with entries, or (None, None) for an empty ledger
+    with get_pool().reader() as conn:
+        return conn.execute("SELECT MIN(period), MAX(period) FROM monthly_totals").fetchone()
+
+
+# ---- Range analytics ----
+# Per-group monthly totals over an arbitrary range with rolling averages,
+# year-over-year change and running totals, all computed by SQLite window
+# functions over the rollup. Every calendar month in the range gets a row
+# (zero when nothing was spent), so a window always spans the same number
+# of months, and the query reads only the rollup rows inside the range.
+
+ROLLING_WINDOWS = [3, 6, 12]
+
+@profiling.traced
+def get_range_analytics(start, end):
+    first, last = period_index(start), period_index(end)
+    if first > last:
+        raise ValueError(f"Range start {start} is after its end {end}")
+    # The windows and the year-over-year lag look back before the range
+    lookback = max(max(ROLLING_WINDOWS) - 1, 12)
+    case, case_params = _group_case()
+    groups = list(CATEGORY_GROUPS)
+    rolling = ", ".join(f"AVG(total) OVER (w ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW) AS avg_{n}m"
+                        for n in ROLLING_WINDOWS)
+    return _with_date_str(_read(f"""
+        WITH RECURSIVE months (idx) AS (
+            SELECT ? UNION ALL SELECT idx + 1 FROM months WHERE idx < ?
+        ),
+        groups (category, position) AS (
+            VALUES {', '.join(['(?, ?)'] * len(groups))}
+        ),
+        totals AS (
+            SELECT {_period_index_sql("period")} AS idx, category, SUM(total) AS total FROM (
+                SELECT m.period, m.total, {case} AS category
+                FROM monthly_totals m JOIN labels l ON l.id = m.label_id
+                WHERE m.period BETWEEN ? AND ?
+            ) WHERE category IS NOT NULL
+            GROUP BY period, category
+        ),
+        grid AS (
+            SELECT months.idx, groups.category, groups.position, COALESCE(totals.total, 0) AS total
+            FROM months CROSS JOIN groups
+            LEFT JOIN totals ON totals.idx = months.idx AND totals.category = groups.category
+        ),
+        windowed AS (
+            SELECT idx, category, position, total, {rolling},
+                   LAG(total, 12) OVER w AS last_year
+            FROM grid
+            WINDOW w AS (PARTITION BY category ORDER BY idx)
+        )
+        SELECT printf('%04d-%02d', idx / 12, idx % 12 + 1) AS period, category, total,
+               {', '.join(f"avg_{n}m" for n in ROLLING_WINDOWS)},
+               last_year, (total - last_year) / NULLIF(last_year, 0) AS yoy_change,
+               SUM(total) OVER (PARTITION BY category ORDER BY idx ROWS UNBOUNDED PRECEDING) AS running_total
+        FROM windowed
+        WHERE idx >= ?
+        ORDER BY idx, position
+    """, [first - lookback, last]
+       + [value for position, group in enumerate(groups) for value in (group, position)]
+       + case_params + [shift_period(start, -lookback), end, first]))
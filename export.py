@@ -0,0 +1,123 @@
+# export.py
+# Lazy, chunked exports of the ledger. Rows are pulled from SQLite with
+# fetchmany and written out a chunk at a time, so memory use stays flat no
+# matter how large the history is. Nothing runs until an export is actually
+# requested (the dashboard passes these as download_button callables).
+#
+# Filters: start/end are inclusive "YYYY-MM" periods, label a single label.
+# path picks the ledger file; the default is the calling thread's ledger, so
+# callables run later from another thread should pass it explicitly.
+import csv
+import io
+import tempfile
+
+import db
+
+CHUNK_SIZE = 10_000
+EXPORT_COLUMNS = ["date_str", "label", "amount", "comment", "timestamp"]
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _query(start=None, end=None, label=None):
+    where = []
+    params = []
+    if start:
+        where.append("period >= ?")
+        params.append(start)
+    if end:
+        where.append("period <= ?")
+        params.append(end)
+    if label:
+        where.append("label = ?")
+        params.append(label)
+    sql = """
+        SELECT date_str, label,
+               CASE WHEN amount = CAST(amount AS INTEGER) THEN CAST(amount AS INTEGER) ELSE amount END,
+               comment, timestamp
+        FROM expenses
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY period, id", params
+
+
+def iter_rows(start=None, end=None, label=None, chunk_size=CHUNK_SIZE, path=None):
+    # Yields lists of row tuples, at most chunk_size at a time, from a
+    # connection of its own so a slow download never holds a pooled reader
+    sql, params = _query(start, end, label)
+    with db.get_pool(path).dedicated_reader() as conn:
+        cur = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+
+def iter_csv(start=None, end=None, label=None, chunk_size=CHUNK_SIZE, path=None):
+    # Yields UTF-8 CSV bytes, header first, one block per chunk of rows
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+    for rows in iter_rows(start, end, label, chunk_size, path):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def write_csv(fileobj, start=None, end=None, label=None, chunk_size=CHUNK_SIZE, path=None):
+    for block in iter_csv(start, end, label, chunk_size, path):
+        fileobj.write(block)
+
+
+def write_parquet(fileobj, start=None, end=None, label=None, chunk_size=CHUNK_SIZE, compression="zstd", path=None):
+    # One Parquet row group per chunk; needs pyarrow
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)") from exc
+
+    schema = pa.schema([
+        ("date_str", pa.string()),
+        ("label", pa.string()),
+        ("amount", pa.float64()),
+        ("comment", pa.string()),
+        ("timestamp", pa.string()),
+    ])
+    with pq.ParquetWriter(fileobj, schema, compression=compression) as writer:
+        for rows in iter_rows(start, end, label, chunk_size, path):
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            ))
+
+
+def export_file(fmt="csv", start=None, end=None, label=None, chunk_size=CHUNK_SIZE, path=None):
+    # Writes the export to a temporary file and returns it rewound, ready to
+    # hand to st.download_button or shutil.copyfileobj
+    out = tempfile.TemporaryFile()
+    if fmt == "parquet":
+        write_parquet(out, start, end, label, chunk_size, path=path)
+    elif fmt == "csv":
+        write_csv(out, start, end, label, chunk_size, path)
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    out.seek(0)
+    return out
+
+
+def file_name(fmt, start=None, end=None, label=None):
+    parts = ["expenses", start or "all", end or "latest"]
+    if label:
+        parts.append(label.replace(" ", "_"))
+    return "_".join(parts) + "." + FORMATS[fmt][1]
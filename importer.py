@@ -0,0 +1,112 @@
+# importer.py
+# Bulk loading of expense CSVs and bank-statement exports. Files are streamed
+# in chunks; each chunk is validated with the same rules as the sidebar form,
+# de-duplicated against rows already in the database and written with
+# executemany inside a single transaction.
+#
+# Recognised columns (case-insensitive):
+#   month:   date_str | month, e.g. "July 2025"   -- or --   date (any date)
+#   label:   label | category
+#   amount:  amount | debit
+#   comment: comment | description | narration   (optional)
+import time
+
+import pandas as pd
+
+import db
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+COLUMN_ALIASES = {
+    "date_str": ["date_str", "month"],
+    "date": ["date"],
+    "label": ["label", "category"],
+    "amount": ["amount", "debit"],
+    "comment": ["comment", "description", "narration"],
+}
+
+
+def _resolve_columns(columns):
+    lookup = {c.strip().lower(): c for c in columns}
+    resolved = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lookup:
+                resolved[field] = lookup[alias]
+                break
+    missing = [f for f in ("label", "amount") if f not in resolved]
+    if "date_str" not in resolved and "date" not in resolved:
+        missing.append("date_str (or date)")
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    return resolved
+
+
+def _normalize(chunk, columns):
+    if "date_str" in columns:
+        date_str = chunk[columns["date_str"]].astype("string").str.strip()
+    else:
+        raw = chunk[columns["date"]]
+        dates = pd.to_datetime(raw, errors="coerce", dayfirst=True, format="mixed")
+        date_str = dates.dt.strftime("%B %Y").fillna(raw)
+    comment = chunk[columns["comment"]] if "comment" in columns else pd.Series("", index=chunk.index)
+    return pd.DataFrame({
+        "date_str": date_str.fillna(""),
+        "label": chunk[columns["label"]].astype("string").str.strip().fillna(""),
+        "amount": pd.to_numeric(chunk[columns["amount"]], errors="coerce"),
+        "comment": comment.astype("string").str.strip().fillna(""),
+    })
+
+
+def import_csv(source, chunk_size=DEFAULT_CHUNK_SIZE, dedupe=True, progress=None, user=None):
+    # source is a path or a binary/text file object. progress, if given, is
+    # called with the running result after every chunk. Rows are recorded as
+    # added by user.
+    result = {"read": 0, "inserted": 0, "duplicates": 0, "rejected": [], "seconds": 0.0, "rows_per_sec": 0.0}
+    existing = {}
+    loaded_periods = set()
+    start = time.perf_counter()
+
+    reader = pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                         skipinitialspace=True)
+    columns = None
+    for chunk in reader:
+        if columns is None:
+            columns = _resolve_columns(chunk.columns)
+        frame = _normalize(chunk, columns)
+        first_line = result["read"] + 2  # 1-based, after the header row
+        result["read"] += len(frame)
+
+        rows = []
+        records = zip(frame["date_str"].tolist(), frame["label"].tolist(),
+                      frame["amount"].astype(object).where(frame["amount"].notna(), None).tolist(),
+                      frame["comment"].tolist())
+        for offset, (date_str, label, amount, comment) in enumerate(records):
+            error = db.validate_expense(date_str, label, amount, comment)
+            if error:
+                result["rejected"].append((first_line + offset, error))
+                continue
+            rows.append((date_str, label, amount, comment))
+
+        if dedupe and rows:
+            periods = {db.parse_period(r[0]) for r in rows} - loaded_periods
+            existing.update(db.get_expense_counts(periods))
+            loaded_periods |= periods
+            fresh = []
+            for row in rows:
+                key = (db.parse_period(row[0]), row[1], row[2], row[3])
+                if existing.get(key):
+                    existing[key] -= 1
+                    result["duplicates"] += 1
+                else:
+                    fresh.append(row)
+            rows = fresh
+
+        if rows:
+            result["inserted"] += db.insert_expenses(rows, user)
+        result["seconds"] = time.perf_counter() - start
+        result["rows_per_sec"] = result["read"] / result["seconds"] if result["seconds"] else 0.0
+        if progress:
+            progress(result)
+
+    return result
@@ -0,0 +1,140 @@
+# manage.py
+# Maintenance commands for the expenses database.
+#
+#   python manage.py rollup verify
+#   python manage.py rollup rebuild
+#   python manage.py import statement.csv
+#   python manage.py export history.parquet --start 2025-01 --end 2025-12
+#   python manage.py events status
+#   python manage.py events compact --keep 1000
+#   python manage.py ledgers create smith
+#   python manage.py --ledger smith rollup verify
+import argparse
+import os
+import sys
+
+import db
+import export
+import importer
+
+
+def cmd_rollup(args):
+    if args.action == "rebuild":
+        rows = db.rebuild_monthly_totals()
+        print(f"Rebuilt monthly_totals: {rows} rows")
+        return 0
+    drift = db.verify_monthly_totals()
+    if drift.empty:
+        print("monthly_totals is in sync with expenses")
+        return 0
+    print(f"monthly_totals has drifted on {len(drift)} (period, label) rows:")
+    print(drift.to_string(index=False))
+    print("Run `python manage.py rollup rebuild` to repair it.")
+    return 1
+
+
+def cmd_import(args):
+    def report(result):
+        print(f"  {result['read']:,} read, {result['inserted']:,} inserted, "
+              f"{result['duplicates']:,} duplicates, {len(result['rejected']):,} rejected "
+              f"({result['rows_per_sec']:,.0f} rows/s)", flush=True)
+
+    result = importer.import_csv(args.file, chunk_size=args.chunk_size,
+                                 dedupe=not args.no_dedupe, progress=report)
+    print(f"Imported {result['inserted']:,} rows from {args.file} in {result['seconds']:.1f}s")
+    for line, reason in result["rejected"][:20]:
+        print(f"  line {line}: {reason}")
+    if len(result["rejected"]) > 20:
+        print(f"  ... and {len(result['rejected']) - 20:,} more rejected rows")
+    return 1 if result["rejected"] else 0
+
+
+def cmd_export(args):
+    fmt = args.format or ("parquet" if args.file.endswith(".parquet") else "csv")
+    with open(args.file, "wb") as out:
+        if fmt == "parquet":
+            export.write_parquet(out, args.start, args.end, args.label, args.chunk_size)
+        else:
+            export.write_csv(out, args.start, args.end, args.label, args.chunk_size)
+    print(f"Wrote {args.file} ({os.path.getsize(args.file):,} bytes, {fmt})")
+    return 0
+
+
+def cmd_events(args):
+    if args.action == "compact":
+        dropped = db.compact_events(keep=args.keep)
+        print(f"Folded {dropped:,} events into the snapshot")
+    stats = db.get_event_stats()
+    if not stats["events"]:
+        print(f"Change log is empty (compacted through #{stats['compacted_through']})")
+        return 0
+    print(f"Change log: {stats['events']:,} events, #{stats['first_seq']} to #{stats['last_seq']} "
+          f"(compacted through #{stats['compacted_through']})")
+    return 0
+
+
+def cmd_ledgers(args):
+    if args.action == "create":
+        if not args.name:
+            print("ledgers create needs a name")
+            return 2
+        if args.name in db.list_ledgers():
+            print(f"Ledger {args.name!r} already exists")
+            return 1
+        path = db.use_ledger(args.name, create=True)
+        db.init_db()
+        print(f"Created ledger {args.name!r} at {path}")
+        return 0
+    for name in db.list_ledgers():
+        print(name)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly spend tracker maintenance")
+    parser.add_argument("--db", default=db.DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--ledger", help=f"tenant ledger name, stored under {db.LEDGER_DIR}/ (overrides --db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rollup", help="check or repair the monthly_totals rollup")
+    p.add_argument("action", choices=["verify", "rebuild"])
+    p.set_defaults(func=cmd_rollup)
+
+    p = sub.add_parser("import", help="bulk import a CSV or bank statement export")
+    p.add_argument("file")
+    p.add_argument("--chunk-size", type=int, default=importer.DEFAULT_CHUNK_SIZE)
+    p.add_argument("--no-dedupe", action="store_true", help="keep rows that already exist")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="stream the ledger (or a date range) to CSV or Parquet")
+    p.add_argument("file")
+    p.add_argument("--start", help="first month, YYYY-MM")
+    p.add_argument("--end", help="last month, YYYY-MM")
+    p.add_argument("--label")
+    p.add_argument("--format", choices=list(export.FORMATS), help="default: from the file extension")
+    p.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("events", help="inspect or compact the change log behind undo/redo")
+    p.add_argument("action", choices=["status", "compact"])
+    p.add_argument("--keep", type=int, default=db.EVENT_LOG_KEEP, help="newest events to keep when compacting")
+    p.set_defaults(func=cmd_events)
+
+    p = sub.add_parser("ledgers", help="list tenant ledgers or create a new one")
+    p.add_argument("action", choices=["list", "create"])
+    p.add_argument("name", nargs="?")
+    p.set_defaults(func=cmd_ledgers)
+
+    args = parser.parse_args(argv)
+    db.DB_NAME = args.db
+    try:
+        db.use_ledger(args.ledger)
+    except ValueError as exc:
+        print(exc)
+        return 2
+    db.init_db()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
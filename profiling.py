@@ -0,0 +1,146 @@
+# profiling.py
+# Per-rerun instrumentation for the dashboard: wall time of each page
+# section, every db.py call (duration and rows returned) and the size of the
+# payloads handed to the frontend. Each finished rerun is appended to a
+# rolling JSON-lines log and can be shown in the debug panel (?debug=1).
+#
+#   SPEND_TRACKER_PROFILE=0            turn instrumentation off
+#   SPEND_TRACKER_PROFILE_LOG=path     log file (default profile.jsonl, "" for none)
+import functools
+import json
+from contextlib import contextmanager
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+ENABLED = os.environ.get("SPEND_TRACKER_PROFILE", "1") != "0"
+LOG_PATH = os.environ.get("SPEND_TRACKER_PROFILE_LOG", "profile.jsonl")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+# Streamlit runs each session's script on its own thread
+_local = threading.local()
+_logger = logging.getLogger("spend_tracker.profile")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+_logger_lock = threading.Lock()
+
+
+def _log():
+    # (Re)attaches the rotating handler if LOG_PATH changed since the last run
+    with _logger_lock:
+        path = os.path.abspath(LOG_PATH)
+        if not _logger.handlers or _logger.handlers[0].baseFilename != path:
+            for handler in _logger.handlers:
+                _logger.removeHandler(handler)
+                handler.close()
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+        return _logger
+
+
+def current():
+    return getattr(_local, "run", None)
+
+
+def start_run(page="dashboard"):
+    if not ENABLED:
+        return None
+    _local.run = {
+        "page": page,
+        "started": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "t0": time.perf_counter(),
+        "sections": [],
+        "db_calls": [],
+        "payloads": [],
+        "_open": None,
+    }
+    return _local.run
+
+
+def begin(section):
+    # Closes the section in progress (if any) and starts timing the next one
+    run = current()
+    if run is None:
+        return
+    now = time.perf_counter()
+    if run["_open"] is not None:
+        name, t0 = run["_open"]
+        run["sections"].append({"section": name, "ms": (now - t0) * 1000})
+    run["_open"] = (section, now)
+
+
+@contextmanager
+def fragment(name):
+    # A Streamlit fragment rerun executes only the fragment body, so profile
+    # it as a run of its own; inside a full rerun it is just another section
+    own = current() is None
+    if own:
+        start_run(f"fragment:{name}")
+    begin(name)
+    try:
+        yield
+    finally:
+        if own:
+            finish_run()
+
+
+def finish_run():
+    run = current()
+    if run is None:
+        return None
+    begin(None)
+    run.pop("_open")
+    run["total_ms"] = (time.perf_counter() - run.pop("t0")) * 1000
+    run["db_ms"] = sum(c["ms"] for c in run["db_calls"])
+    run["rows_fetched"] = sum(c["rows"] or 0 for c in run["db_calls"])
+    run["payload_bytes"] = sum(p["bytes"] for p in run["payloads"])
+    _local.run = None
+    if LOG_PATH:
+        _log().info(json.dumps(run, default=str))
+    return run
+
+
+def traced(fn):
+    # Records duration and result size of each call made during a rerun
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        run = current()
+        if run is None:
+            return fn(*args, **kwargs)
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        run["db_calls"].append({
+            "call": fn.__name__,
+            "ms": (time.perf_counter() - t0) * 1000,
+            "rows": len(result) if hasattr(result, "__len__") else None,
+        })
+        return result
+
+    return wrapper
+
+
+def payload_size(obj):
+    # Approximate bytes sent to the browser for a frame or a chart, with
+    # chart data counted as inline JSON records
+    if type(obj).__module__.startswith("altair"):
+        return len(obj.to_json())
+    if isinstance(obj, dict):
+        return len(json.dumps(obj, default=lambda frame: frame.to_dict("records")))
+    if hasattr(obj, "memory_usage"):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (bytes, str)):
+        return len(obj)
+    return 0
+
+
+def payload(name, obj):
+    run = current()
+    if run is not None:
+        run["payloads"].append({"element": name, "bytes": payload_size(obj)})
+    return obj
@@ -0,0 +1,52 @@
+# test_cache.py
+# Regression tests for the process cache: a write landing while a cached
+# value is being computed must not leave a wrong value behind.
+import pytest
+
+import cache
+import dashboard
+import db
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    db.close_all()
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "expenses.db"))
+    db.use_ledger(None)
+    db.init_db()
+    cache.clear()
+    yield
+    cache.clear()
+    db.close_all()
+
+
+def total():
+    labels, _ = dashboard.matrices()
+    return int(labels.to_numpy().sum())
+
+
+def test_write_during_compute_is_not_counted_twice(ledger, monkeypatch):
+    db.insert_expense("June 2025", "Fuel", 100, "")
+    assert total() == 100
+
+    # Another session adds 50 while matrices() is being rebuilt
+    read_totals = dashboard.get_label_totals
+
+    def racing_read():
+        monkeypatch.setattr(dashboard, "get_label_totals", read_totals)
+        db.insert_expense("June 2025", "Fuel", 50, "")
+        return read_totals()
+
+    cache.clear()
+    monkeypatch.setattr(dashboard, "get_label_totals", racing_read)
+    assert total() == 150
+    assert total() == 150
+    assert total() == 150
+
+
+def test_delta_after_quiet_compute(ledger):
+    db.insert_expense("June 2025", "Fuel", 100, "")
+    assert total() == 100
+    db.insert_expense("July 2025", "Fuel", 50, "")
+    assert total() == 150
+    assert cache.stats()["deltas"] >= 1
@@ -0,0 +1,58 @@
+# test_db.py
+# Regression tests for db.py reads that must see one consistent ledger.
+import pytest
+
+import db
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    db.close_all()
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "expenses.db"))
+    db.use_ledger(None)
+    db.init_db()
+    for n in (1, 2, 3):
+        db.insert_expense("June 2025", "Fuel", 100 * n, f"c{n}")
+    yield
+    db.close_all()
+
+
+@pytest.mark.parametrize("deleted", [2, 3])
+def test_comments_match_rows_despite_delete_between_reads(ledger, monkeypatch, deleted):
+    # Another session deletes an entry after the frame is read but before
+    # its comments are
+    read_frame = db._ledger_frame
+
+    def racing_read(*args, **kwargs):
+        frame = read_frame(*args, **kwargs)
+        db.delete_expense(deleted)
+        return frame
+
+    monkeypatch.setattr(db, "_ledger_frame", racing_read)
+    frame = db.get_all_expenses(comments=True)
+    assert dict(zip(frame["id"], frame["comment"])) == {1: "c1", 2: "c2", 3: "c3"}
+
+
+def test_unknown_ledger_is_not_created(ledger, tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "LEDGER_DIR", str(tmp_path / "ledgers"))
+    with pytest.raises(ValueError):
+        db.use_ledger("typo")
+    assert db.list_ledgers() == []
+    db.use_ledger("smith", create=True)
+    db.init_db()
+    db.use_ledger(None)
+    db.use_ledger("smith")
+    assert db.list_ledgers() == ["smith"]
+
+
+def test_idle_pools_are_closed(ledger, tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "LEDGER_DIR", str(tmp_path / "ledgers"))
+    db.use_ledger("smith", create=True)
+    db.init_db()
+    smith = db.current_ledger()
+    db.use_ledger(None)
+    monkeypatch.setattr(db, "POOL_IDLE_SECONDS", 0)
+    monkeypatch.setattr(db, "_next_sweep", 0.0)
+    db.get_data_version()
+    assert smith not in db._pools
+    assert db.current_ledger() in db._pools
@@ -0,0 +1,218 @@
+# writer.py
+# Background writer for the dashboard. Sessions put inserts and deletes on a
+# queue instead of each opening its own write transaction; one thread per
+# database drains the queue and applies everything waiting in a single
+# group commit. Each request gets an acknowledgement (row id, batch size,
+# latency) or the error that stopped it.
+#
+# "database is locked" / "busy" from another process holding the file is
+# retried with exponential backoff before the batch is failed. A caller that
+# stops waiting cancels its request; one not yet started is then never applied.
+#
+# Every COMPACT_EVERY writes the thread also compacts the ledger's change log.
+# A ledger's thread is stopped once it has been idle for db.POOL_IDLE_SECONDS
+# and started again by its next write.
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import db
+
+MAX_BATCH = 256
+BATCH_WINDOW = 0          # seconds to wait for more requests after the first;
+                          # 0 takes whatever queued up during the last commit
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.05       # seconds; doubled after each locked attempt
+# Longest a started batch can keep retrying: each attempt may block for the
+# busy timeout, plus the backoff between attempts. Kept under ACK_TIMEOUT.
+MAX_COMMIT_TIME = (MAX_RETRIES + 1) * db.BUSY_TIMEOUT_MS / 1000 + BACKOFF_BASE * (2 ** MAX_RETRIES - 1)
+ACK_TIMEOUT = 30
+COMPACT_EVERY = 1000
+
+# Operation name -> function applying it on an open write transaction
+OPERATIONS = {
+    "insert": db._insert_expense,
+    "edit": db._edit_expense,
+    "delete": db._delete_expense,
+    "delete_last": db._delete_last_expense,
+    "undo": db._undo,
+    "redo": db._redo,
+}
+
+
+def _is_locked(exc):
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+class WriteQueue:
+    # Queue plus the daemon thread that commits it, for one database file
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = {"requests": 0, "batches": 0, "retries": 0, "failed": 0, "max_batch": 0, "compacted": 0,
+                      "cancelled": 0}
+        self._since_compaction = 0
+        self._queue = queue.Queue()
+        self.last_used = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"writer:{path}", daemon=True)
+        self._thread.start()
+
+    def submit(self, op, *args):
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown write {op!r}; expected one of {', '.join(OPERATIONS)}")
+        future = Future()
+        self.last_used = time.monotonic()
+        self._queue.put((op, args, future, time.perf_counter()))
+        return future
+
+    def idle(self, now):
+        return self._queue.empty() and now - self.last_used > db.POOL_IDLE_SECONDS
+
+    def close(self):
+        # Applies what is already queued, then stops the thread
+        self._queue.put(None)
+        self._thread.join()
+
+    def _take_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + BATCH_WINDOW
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._commit(batch)
+            self.last_used = time.monotonic()
+            self._since_compaction += len(batch)
+            if self._since_compaction >= COMPACT_EVERY:
+                self._since_compaction = 0
+                try:
+                    self.stats["compacted"] += db.compact_events(path=self.path)
+                except sqlite3.Error:
+                    pass  # tried again after the next COMPACT_EVERY writes
+
+    def _commit(self, batch):
+        # Requests whose caller already gave up are dropped, the rest can no
+        # longer be cancelled
+        live = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        self.stats["cancelled"] += len(batch) - len(live)
+        batch = live
+        if not batch:
+            return
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                results = self._apply(batch)
+                break
+            except Exception as exc:
+                if _is_locked(exc) and attempt < MAX_RETRIES:
+                    self.stats["retries"] += 1
+                    time.sleep(BACKOFF_BASE * 2 ** attempt)
+                    continue
+                self.stats["failed"] += len(batch)
+                for _, _, future, _ in batch:
+                    future.set_exception(exc)
+                return
+
+        done = time.perf_counter()
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        for (op, _, future, queued), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result({"op": op, "result": result, "batch": len(batch),
+                                   "latency_ms": (done - queued) * 1000})
+
+    def _apply(self, batch):
+        # One transaction for the batch; a savepoint per request so a bad
+        # request fails on its own without rolling back its neighbours
+        results = []
+        with db.get_pool(self.path).writer() as conn:
+            for op, args, _, _ in batch:
+                conn.execute("SAVEPOINT request")
+                try:
+                    results.append(OPERATIONS[op](conn, *args))
+                except (sqlite3.Error, ValueError) as exc:
+                    if _is_locked(exc):
+                        raise
+                    conn.execute("ROLLBACK TO request")
+                    results.append(exc)
+                conn.execute("RELEASE request")
+        return results
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path=None):
+    path = path or db.current_ledger()
+    now = time.monotonic()
+    with _writers_lock:
+        for other, writer in list(_writers.items()):
+            if other != path and writer.idle(now):
+                writer.close()
+                del _writers[other]
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = WriteQueue(path)
+        writer.last_used = now
+        return writer
+
+
+def close_all():
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.close()
+        _writers.clear()
+
+
+def wait(future, timeout=ACK_TIMEOUT):
+    # The ack, or TimeoutError once the request is cancelled unapplied. A
+    # request the writer has already started is waited out instead (at most
+    # MAX_COMMIT_TIME), so a timeout never hides a write that went through.
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        if future.cancel():
+            raise
+        return future.result()
+
+
+# Blocking helpers for a session: queue the write on its ledger and wait for the ack
+def insert_expense(date_str, label, amount, comment, user=None, timeout=ACK_TIMEOUT):
+    return wait(get_writer().submit("insert", date_str, label, amount, comment, user), timeout)
+
+def delete_last_expense(user=None, timeout=ACK_TIMEOUT):
+    return wait(get_writer().submit("delete_last", user), timeout)
+
+def edit_expense(expense_id, label, amount, comment, user=None, timeout=ACK_TIMEOUT):
+    return wait(get_writer().submit("edit", expense_id, label, amount, comment, user), timeout)
+
+def delete_expense(expense_id, user=None, timeout=ACK_TIMEOUT):
+    return wait(get_writer().submit("delete", expense_id, user), timeout)
+
+def undo(user=None, timeout=ACK_TIMEOUT):
+    return wait(get_writer().submit("undo", user), timeout)
+
+def redo(user=None, timeout=ACK_TIMEOUT):
+    return wait(get_writer().submit("redo", user), timeout)